@@ -1,6 +1,5 @@
 # General-purpose imports
 import cv2
-import numpy as np
 import os
 import sys
 import time
@@ -10,12 +9,13 @@ sys.path.insert(0, '../library')
 import racecar_core
 import racecar_utils as rc_utils
 
-# PyCoral imports for object detection
-from pycoral.adapters.common import input_size
-from pycoral.adapters.detect import get_objects
-from pycoral.utils.dataset import read_label_file
-from pycoral.utils.edgetpu import make_interpreter
-from pycoral.utils.edgetpu import run_inference
+# Shared modules (profiler, ...) live in labs/utility
+sys.path.insert(1, 'utility')
+import stage_profiler
+import pid
+import inference_pipeline
+import model_cache
+import tracker
 
 # Global variables
 rc = racecar_core.create_racecar()
@@ -23,41 +23,94 @@ rc = racecar_core.create_racecar()
 # Object detection variables
 default_path = os.path.expanduser('~/jupyter_ws/TPS/labs/model')
 model_name = 'machineVision.tflite'
+cpu_model_name = 'machineVision_cpu.tflite'  # Model before EdgeTPU compilation, for BACKEND = "cpu"
 label_name = 'labels.txt'
 model_path = os.path.join(default_path, model_name)
+cpu_model_path = os.path.join(default_path, cpu_model_name)
 label_path = os.path.join(default_path, label_name)
-interpreter = None
+backend = None
 labels = None
 inference_size = None
 SCORE_THRESH = 0.5
 NUM_CLASSES = 1
 
+# Detector: "edgetpu" (Coral + pycoral), "cpu" (tflite-runtime) or "synthetic" (CPU
+# stand-in, follows a red blob)
+BACKEND = "edgetpu"
+backend_path = cpu_model_path if BACKEND == "cpu" else model_path
+
+# Load and warm up the model on a background thread as soon as this file is imported, so
+# start() does not wait for it. Either way the model is loaded only once per process
+PRELOAD = True
+if PRELOAD:
+    model_cache.preload(BACKEND, backend_path, label_path)
+
+# Run preprocess / inference / postprocess on background threads and steer on the newest
+# detection every frame; False runs them serially inside update()
+PIPELINE = True
+pipeline = None
+
+# Track the followed object between detections: inference runs on 1 of every
+# INFERENCE_EVERY frames, and the car keeps steering on the tracked box through short
+# dropouts (up to max_age seconds) instead of stopping
+TRACK = True
+INFERENCE_EVERY = 1
+track = tracker.BoxTracker(max_age=0.5)
+frame_count = 0
+last_seq = 0  # sequence number of the last pipeline detection used
+last_objs = []  # newest detections, in image pixels
+last_objs_time = 0.0  # time.monotonic() of the frame last_objs were detected on
+
+# Detections older than this (s) count as no detection, so the car stops instead of
+# following a frozen box if the detector stalls or fails
+MAX_DETECTION_AGE = 0.5
+
+# Run inference only on a region around the tracked box (needs TRACK), so a distant car
+# covers more model input pixels. Every FULL_FRAME_EVERY-th detector run, and whenever
+# the track is lost, the full frame is used instead to find (new) targets
+ROI_CROP = False
+FULL_FRAME_EVERY = 10
+detector_runs = 0
+
 # Controller variables
 SPEED = 0.7  # Constant speed for the car
 
 kp = 0.08  # Proportional gain
 ki = 0.0  # Integral gain
 kd = 0.1  # Derivative gain
-prev_error = 0
-integral = 0
-last_time = 0
+
+# The PID works on e = setpoint - measurement, the opposite sign of center_x - image_center,
+# so the gains are negated (and scaled by 1/100 as before). dt comes from time.monotonic.
+steering_pid = pid.PID(kp=-kp / 100, ki=-ki / 100, kd=-kd / 100, derivative_tau=0.05,
+                       integral_limit=0.5)
+
+# Profiling variables
+PROFILE = False  # Print per-stage timing (p50/p95/p99) every second and a histogram on exit
+profiler = stage_profiler.StageProfiler(enabled=PROFILE)
 
 def start():
     """
     This function is run once every time the start button is pressed
     """
-    global interpreter, labels, inference_size, last_time
+    global backend, labels, inference_size, pipeline
+
+    # Get the (cached, warmed-up) object detection model and labels
+    backend = model_cache.get(BACKEND, backend_path, label_path)
+    print(model_cache.report())
+    labels = backend.labels
+    inference_size = backend.input_size
 
-    # Load the object detection model and labels
-    print(f'Loading model: {model_path}')
-    interpreter = make_interpreter(model_path)
-    interpreter.allocate_tensors()
-    labels = read_label_file(label_path)
-    inference_size = input_size(interpreter)
+    # Start the inference threads (replacing the ones from a previous start)
+    if pipeline is not None:
+        pipeline.stop()
+    pipeline = None
+    if PIPELINE:
+        pipeline = inference_pipeline.InferencePipeline(backend, SCORE_THRESH, NUM_CLASSES)
 
     # Set the initial speed and angle
     rc.drive.set_speed_angle(0, 0)
-    last_time = time.time()
+    steering_pid.reset()
+    track.reset()
     print(">> PID Controller Initialized")
 
 def update():
@@ -65,32 +118,109 @@ def update():
     After start() is run, this function is run every frame until the back button
     is pressed
     """
+    global frame_count, last_seq, last_objs, last_objs_time, detector_runs
+
     # Get the latest image from the camera
-    image = rc.camera.get_color_image()
+    with profiler.stage("get_color_image"):
+        image = rc.camera.get_color_image()
 
     if image is None:
         return
+    frame_time = time.monotonic()
+
+    # Only run the detector on 1 of every INFERENCE_EVERY frames
+    frame_count += 1
+    run_detector = frame_count % INFERENCE_EVERY == 0
+    objs = None  # None = no new detection result this frame
+    latency = 0.0
+
+    # Region the detector sees: around the tracked box, or the full frame
+    roi = None
+    if run_detector:
+        detector_runs += 1
+        if ROI_CROP and track.active and detector_runs % FULL_FRAME_EVERY != 0:
+            roi = inference_pipeline.roi_around(track.bbox, image.shape, inference_size)
+
+    if pipeline is not None:
+        # Hand the frame to the inference threads and pick up any newer detection
+        if run_detector:
+            with profiler.stage("submit"):
+                pipeline.submit(image, roi)
+        detection = pipeline.latest()
+        if detection is not None and detection.seq != last_seq:
+            last_seq = detection.seq
+            objs = detection.objects
+            latency = detection.latency
+            frame_time = detection.timestamp
+    elif run_detector:
+        # Preprocess the image straight into the model input (resize + BGR->RGB)
+        with profiler.stage("preprocess"):
+            if roi is None:
+                roi = (0, 0, image.shape[1], image.shape[0])
+            x0, y0, x1, y1 = roi
+            backend.preprocess(image[y0:y1, x0:x1])
 
-    # Preprocess the image for the model
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    rgb_image_resized = cv2.resize(rgb_image, inference_size)
+        # Run inference on the image
+        with profiler.stage("run_inference"):
+            backend.invoke()
+        with profiler.stage("get_objects"):
+            objs = backend.get_objects(SCORE_THRESH)[:NUM_CLASSES]
+            objs = scale_objects(objs, roi)
 
-    # Run inference on the image
-    run_inference(interpreter, rgb_image_resized.tobytes())
-    objs = get_objects(interpreter, SCORE_THRESH)[:NUM_CLASSES]
+    if objs is not None:
+        last_objs = objs
+        last_objs_time = frame_time
+    if time.monotonic() - last_objs_time > MAX_DETECTION_AGE:
+        last_objs = []
+
+    # Steer on the tracked box (propagated every frame) or on the newest detections
+    if TRACK:
+        with profiler.stage("track"):
+            track.predict(rc.get_delta_time())
+            if objs is not None:
+                track.update(objs, latency)
+        objs = [track.object._replace(bbox=track.bbox)] if track.active else []
+    else:
+        objs = last_objs
+
+    # The pipeline may still be reading the submitted frame, so annotate a copy of it
+    # (serially, inference on this frame is already done)
+    display = image.copy() if pipeline is not None else image
 
     # Process the detected objects
-    process_objects(image, objs)
+    with profiler.stage("process_objects"):
+        process_objects(display, objs)
 
     # Display the image
-    rc.display.show_color_image(image)
+    with profiler.stage("show_color_image"):
+        rc.display.show_color_image(display)
 
-def process_objects(image, objs):
+def update_slow():
     """
-    Processes the detected objects to control the car.
+    After start() is run, this function is run at a constant rate that is slower
+    than update().  By default, update_slow() is run once per second
     """
-    global prev_error, integral, last_time
+    if PROFILE:
+        print(profiler.report())
+        if pipeline is not None:
+            detection = pipeline.latest()
+            latency = 1000 * detection.latency if detection is not None else 0.0
+            print(f"pipeline: {pipeline.inferences} inferences, {pipeline.dropped} dropped, "
+                  f"latency {latency:.1f}ms")
 
+def scale_objects(objs, roi):
+    """
+    Maps detections from model input pixels to camera image pixels, given the
+    (x0, y0, x1, y1) region of the image the model was run on.
+    """
+    x0, y0, x1, y1 = roi
+    scale_x, scale_y = (x1 - x0) / inference_size[0], (y1 - y0) / inference_size[1]
+    return [obj._replace(bbox=obj.bbox.scale(scale_x, scale_y).translate(x0, y0)) for obj in objs]
+
+def process_objects(image, objs):
+    """
+    Processes the detected objects (bboxes in image pixels) to control the car.
+    """
     if not objs:
         # If no objects are detected, stop the car
         rc.drive.stop()
@@ -100,9 +230,7 @@ def process_objects(image, objs):
     obj = objs[0]
     
     # Get the bounding box of the object
-    height, width, _ = image.shape
-    scale_x, scale_y = width / inference_size[0], height / inference_size[1]
-    bbox = obj.bbox.scale(scale_x, scale_y)
+    bbox = obj.bbox
     x0, y0 = int(bbox.xmin), int(bbox.ymin)
     x1, y1 = int(bbox.xmax), int(bbox.ymax)
     
@@ -113,35 +241,16 @@ def process_objects(image, objs):
     cv2.rectangle(image, (x0, y0), (x1, y1), (0, 255, 0), 2)
     cv2.circle(image, (center_x, (y0 + y1) // 2), 5, (0, 0, 255), -1)
 
-    # PID control logic
+    # PID control logic: steer the box center towards the image center. The derivative
+    # is filtered and taken on center_x, the integral is clamped, and the angle is
+    # clamped to the valid range
     image_center = rc.camera.get_width() // 2
-    error = center_x - image_center
-
-    # Calculate delta time
-    current_time = time.time()
-    dt = current_time - last_time
-    last_time = current_time
-
-    # Proportional term
-    p_term = kp * error
-    
-    # Integral term
-    integral += error * dt
-    i_term = ki * integral
-
-    # Derivative term
-    derivative = (error - prev_error) / dt
-    d_term = kd * derivative
-    prev_error = error
-    
-    # Calculate the steering angle
-    angle = (p_term + i_term + d_term) / 100
-    angle = np.clip(angle, -1.0, 1.0) # Clamp the angle to the valid range
+    angle = steering_pid.update(center_x, image_center)
 
     # Set the car's speed and angle
     rc.drive.set_speed_angle(SPEED, angle)
 
 
 if __name__ == '__main__':
-    rc.set_start_update(start, update, None)
+    rc.set_start_update(start, update, update_slow)
     rc.go()
@@ -0,0 +1,145 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: async_log.py
+
+Title: Asynchronous Rate-Limited Logger
+
+Purpose: Keep per-frame diagnostics in update() without paying for terminal I/O in the
+control loop. Printing to the car's serial/SSH terminal can block for milliseconds.
+
+logger.log() only stores the format string and its arguments in a bounded queue; the
+text is formatted and written by a background thread. Each message (identified by its
+format string, or an explicit key) is rate limited: calls inside the period are
+coalesced, and the latest values are written once the period expires together with
+how many calls were folded into it. If the queue fills up, the oldest entries are
+dropped and counted rather than blocking the caller.
+
+Usage:
+    logger = async_log.AsyncLogger(period=0.1)
+    logger.log("Speed: {:.2f}, Angle: {:.2f}", speed, angle)   # in update()
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import atexit
+import collections
+import sys
+import threading
+import time
+
+########################################################################################
+# Classes
+########################################################################################
+
+class _MessageState:
+    __slots__ = ("last", "period", "fmt", "args", "suppressed")
+
+    def __init__(self, period):
+        self.last = float("-inf")
+        self.period = period
+        self.fmt = None
+        self.args = None
+        self.suppressed = 0
+
+
+class AsyncLogger:
+    """
+    Lazily formatted, rate-limited logging drained by a background thread.
+    """
+
+    def __init__(self, period=0.0, capacity=256, stream=None, drain_interval=0.05):
+        self.period = period
+        self.stream = sys.stdout if stream is None else stream
+        self.drain_interval = drain_interval
+        self.queue = collections.deque(maxlen=capacity)
+        self.messages = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.dropped = 0
+
+        self.running = True
+        self.thread = threading.Thread(target=self._drain_forever, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # [FUNCTION] Queue a message; fmt uses str.format syntax and is only formatted off-thread
+    def log(self, fmt, *args, key=None, period=None):
+        now = time.monotonic()
+        key = fmt if key is None else key
+        with self.lock:
+            state = self.messages.get(key)
+            if state is None:
+                state = self.messages[key] = _MessageState(self.period if period is None else period)
+            if now - state.last < state.period:
+                # Coalesce: keep only the newest values until the period expires
+                state.fmt = fmt
+                state.args = args
+                state.suppressed += 1
+                return
+            state.last = now
+            suppressed = state.suppressed
+            state.fmt = None
+            state.args = None
+            state.suppressed = 0
+        self._enqueue(fmt, args, suppressed)
+
+    def _enqueue(self, fmt, args, suppressed):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append((fmt, args, suppressed))
+
+    # [FUNCTION] Move coalesced messages whose rate limit expired into the queue
+    def _release_pending(self):
+        now = time.monotonic()
+        with self.lock:
+            for state in self.messages.values():
+                if state.fmt is not None and now - state.last >= state.period:
+                    # The newest values were folded in too, so they are not "suppressed"
+                    self._enqueue(state.fmt, state.args, state.suppressed - 1)
+                    state.last = now
+                    state.fmt = None
+                    state.args = None
+                    state.suppressed = 0
+
+    # [FUNCTION] Format and write everything currently queued
+    def drain(self):
+        self._release_pending()
+        lines = []
+        while self.queue:
+            fmt, args, suppressed = self.queue.popleft()
+            try:
+                text = fmt.format(*args)
+            except Exception as e:
+                text = f"{fmt!r} {args!r} (format failed: {e})"
+            if suppressed:
+                text += f" (+{suppressed} coalesced)"
+            lines.append(text)
+        if self.dropped:
+            lines.append(f">> async_log: dropped {self.dropped} messages (queue full)")
+            self.dropped = 0
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+    def _drain_forever(self):
+        while self.running:
+            self.wake.wait(self.drain_interval)
+            self.wake.clear()
+            self.drain()
+
+    # [FUNCTION] Stop the background thread and write out anything still pending
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wake.set()
+        self.thread.join(timeout=1.0)
+        with self.lock:
+            for state in self.messages.values():
+                state.period = 0
+        self.drain()
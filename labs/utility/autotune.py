@@ -0,0 +1,184 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: autotune.py
+
+Title: Offline Gain Autotuner
+
+Purpose: Recommend A_SENSE / S_SENSE values for lfss.py from a recorded run instead of
+tuning them by trial and error on the floor.
+
+Both lfss.py loops act on integrating plants: the steering angle sets how fast the
+line drifts across the image, and the speed sets how fast the wall distance shrinks.
+Each loop is identified as
+
+    d(error)/dt = gain * x(t - dead_time),    tau * dx/dt = u - x
+
+from the command u and error traces. u must be the command actually sent to
+rc.drive (lfss.py records 0 while the trigger is released), not the controller output:
+1. the run is resampled onto a uniform time grid and the error is differentiated
+2. the command is run through a first-order lag for a grid of candidate tau values
+3. for every (tau, dead time) pair the least-squares gain is the cross-correlation of
+   the error rate with the lagged, filtered command; the pair that explains the most
+   variance wins
+Regressing the noisy error rate on the (noise-free) command keeps the estimate
+unbiased, which an ARX fit with the error rate on both sides is not.
+
+The identified gain and tau are also the PLANT_GAIN / tau of the Smith predictor in
+lagmachine.py.
+
+PD gains then follow from the SIMC rules for an integrating process with lag:
+kp = -1 / (gain * (tau_c + dead_time)), kd = kp * tau, with tau_c = dead_time by
+default (raise it for a calmer response).
+
+Everything but the lag filter is vectorized, so a 10 minute, 60 Hz log identifies in
+about 0.2s per loop.
+
+Usage:
+    python autotune.py lfss.rcrun --setpoint 50
+
+    run = run_recorder.load("lfss.rcrun")
+    model = autotune.identify(run["angle"], run["error"], dt=1/60)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import argparse
+import collections
+import time
+
+import numpy as np
+
+########################################################################################
+# Classes and Functions
+########################################################################################
+
+# Identified plant: d(error)/dt = gain * x(t - dead_time), tau * dx/dt = u - x
+PlantModel = collections.namedtuple("PlantModel", ["gain", "tau", "dead_time", "fit", "dt"])
+
+# Actuator time constants tried by identify() (s); dead time is searched at every frame
+DEFAULT_TAUS = np.concatenate([[0.0], np.geomspace(0.01, 1.0, 24)])
+
+
+# [FUNCTION] Resample (timestamp, signal...) traces onto a uniform grid of step dt
+def resample(timestamps, *signals, dt=None):
+    timestamps = np.asarray(timestamps, np.float64)
+    if dt is None:
+        dt = float(np.median(np.diff(timestamps)))
+    grid = np.arange(timestamps[0], timestamps[-1], dt)
+    return (dt,) + tuple(np.interp(grid, timestamps, np.asarray(s, np.float64)) for s in signals)
+
+
+# [FUNCTION] First-order lag of u for every time constant in taus at once -> (len(u), len(taus))
+def lag_filter(u, taus, dt):
+    alpha = np.where(taus > 0, dt / (np.asarray(taus) + dt), 1.0)
+    out = np.empty((len(u), len(taus)))
+    x = np.full(len(taus), u[0])
+    for k, value in enumerate(u):
+        x += alpha * (value - x)
+        out[k] = x
+    return out
+
+
+# [FUNCTION] Identify an integrating plant with lag and dead time from command u and error y
+def identify(u, y, dt, max_dead_time=1.0, taus=DEFAULT_TAUS):
+    u = np.asarray(u, np.float64)
+    y = np.asarray(y, np.float64)
+    taus = np.asarray(taus, np.float64)
+    rate = np.diff(y) / dt
+    # Jumps (line reacquired elsewhere, LIDAR seeing a different object) are not plant
+    # response: give rates far outside the robust spread zero weight
+    median = np.median(rate)
+    spread = 1.4826 * np.median(np.abs(rate - median)) + 1e-9
+    weight = (np.abs(rate - median) < 6 * spread).astype(np.float64)
+    rate -= np.average(rate, weights=weight)  # constant drift is trim (A_OFFSET), not gain
+    rate *= weight
+    n = len(rate)
+    max_lag = min(int(round(max_dead_time / dt)), n // 4)
+
+    # Candidate actuator states: u through every candidate lag, mean removed
+    x = lag_filter(u[:n], taus, dt)
+    x -= x.mean(axis=0)
+
+    # For a fixed (tau, lag) the least-squares gain is a cross-correlation:
+    # gain = sum(rate[k] * x[k - lag]) / sum(x[k - lag]^2), and the residual is
+    # sum(rate^2) - gain * sum(rate * x). Evaluate every lag for every tau at once.
+    lags = np.arange(max_lag + 1)
+    xr = np.array([rate[lag:] @ x[:n - lag] for lag in lags])  # (lags, taus)
+    xx = np.array([np.einsum("i,ij,ij->j", weight[lag:], x[:n - lag], x[:n - lag]) for lag in lags])
+    rr = np.array([rate[lag:] @ rate[lag:] for lag in lags])
+    gain = xr / np.maximum(xx, 1e-12)
+    sse = rr[:, None] - gain * xr
+    fit = 1 - sse / np.maximum(rr[:, None], 1e-12)
+
+    # Best fit per sample (segments shrink with lag, so compare explained fraction)
+    lag, tau = np.unravel_index(np.argmax(fit), fit.shape)
+    return PlantModel(gain=float(gain[lag, tau]), tau=float(taus[tau]), dead_time=float(lag * dt),
+                      fit=float(fit[lag, tau]), dt=dt)
+
+
+# [FUNCTION] SIMC PD gains (u = kp * error + kd * d(error)/dt) for an identified plant
+def simc_pd(model, tau_c=None):
+    if tau_c is None:
+        tau_c = max(model.dead_time, model.dt)
+    kp = -1 / (model.gain * (tau_c + model.dead_time))
+    kd = kp * model.tau
+    return kp, kd
+
+
+# [FUNCTION] lfss.py steering: kp = -(2/setpoint) * A_SENSE/100 * 2  ->  A_SENSE
+def a_sense_from_kp(kp, setpoint=160):
+    return -kp * setpoint * 100 / 4
+
+
+# [FUNCTION] lfss.py safety stop: kp_now = -1/SS_SETPOINT * S_SENSE/100 * 2  ->  S_SENSE
+def s_sense_from_kp(kp, ss_setpoint=50):
+    return -kp * ss_setpoint * 100 / 2
+
+
+# [FUNCTION] Identify both lfss.py loops from a run_recorder file and recommend gains
+def tune_run(run, ss_setpoint=50, tau_c=None):
+    dt, angle, error, speed, distance = resample(
+        run["timestamp"], run["angle"], run["error"], run["speed"], run["lidar_distance"])
+
+    # Steering: error = setpoint - column, command = angle
+    steer_model = identify(angle, error, dt)
+    steer_kp, steer_kd = simc_pd(steer_model, tau_c)
+
+    # Safety stop: error = SS_SETPOINT - distance, command = speed
+    stop_model = identify(speed, ss_setpoint - distance, dt)
+    stop_kp, stop_kd = simc_pd(stop_model, tau_c)
+
+    return {
+        "steering": (steer_model, steer_kp, steer_kd, a_sense_from_kp(steer_kp)),
+        "stop": (stop_model, stop_kp, stop_kd, s_sense_from_kp(stop_kp, ss_setpoint)),
+    }
+
+
+if __name__ == "__main__":
+    import run_recorder
+
+    parser = argparse.ArgumentParser(description="Recommend lfss.py gains from a recorded run")
+    parser.add_argument("run", help="file written by run_recorder.RunRecorder")
+    parser.add_argument("--setpoint", type=float, default=50, help="SS_SETPOINT used in the run (cm)")
+    parser.add_argument("--tau-c", type=float, default=None,
+                        help="closed-loop time constant (s), default = identified dead time")
+    args = parser.parse_args()
+
+    run = run_recorder.load(args.run)
+    start = time.perf_counter()
+    results = tune_run(run, args.setpoint, args.tau_c)
+    elapsed = time.perf_counter() - start
+
+    print(f">> Identified {len(run['timestamp'])} frames in {1000 * elapsed:.1f}ms")
+    for name, sense_name in (("steering", "A_SENSE"), ("stop", "S_SENSE")):
+        model, kp, kd, sense = results[name]
+        print(f"{name}: gain {model.gain:.3g}/s, tau {model.tau:.3f}s, dead time {model.dead_time:.3f}s "
+              f"(fit R^2 = {model.fit:.2f})")
+        print(f"    -> kp = {kp:.5f}, kd = {kd:.5f}  ({sense_name} = {sense:.0f}%)")
+    model = results["steering"][0]
+    print(f"lagmachine.py: PLANT_GAIN = {abs(model.gain):.0f}, SmithPredictor tau = {model.tau:.3f}")
@@ -0,0 +1,121 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: delay_line.py
+
+Title: Timestamped Delay Line
+
+Purpose: Emulate a fixed (optionally jittery) delay on a command or sensor signal that
+holds at any loop rate. A frame-count queue such as [0] * int(LAGTIME * 60) only gives
+LAGTIME seconds of delay if update() runs at exactly 60 Hz.
+
+Samples are pushed with their time.monotonic() timestamp into a preallocated ring, and
+sample() returns the value the signal had `delay` seconds ago, linearly interpolated
+between the two neighbouring samples (or held, with interpolate=False). Both push and
+sample are amortized O(1): the read position only ever moves forward.
+
+Jitter adds a random extra delay to every read, drawn from "uniform" (0 to jitter
+seconds), "normal" (half-normal with scale jitter), "exponential" (mean jitter) or any
+callable returning seconds. Reads never go back in time, so jitter can stretch the
+delay but never reorders the signal.
+
+Usage:
+    steering_delay = delay_line.DelayLine(0.25)
+    steering_delay.push(angle)                    # what the controller asked for
+    rc.drive.set_speed_angle(speed, steering_delay.sample())
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import math
+import time
+
+import numpy as np
+
+########################################################################################
+# Classes
+########################################################################################
+
+class DelayLine:
+    """
+    Ring of (timestamp, value) pairs read back `delay` seconds late.
+    """
+
+    def __init__(self, delay, capacity=1024, interpolate=True, initial=0.0,
+                 jitter=0.0, distribution="uniform", seed=None):
+        self.delay = delay
+        self.capacity = capacity
+        self.interpolate = interpolate
+        self.initial = initial
+        self.times = [0.0] * capacity
+        self.values = [0.0] * capacity
+        self.head = 0  # number of samples pushed so far
+        self.read = 0  # absolute index of the newest sample at or before the last read time
+        self.last_target = -math.inf
+
+        self.jitter = self._make_jitter(jitter, distribution, np.random.default_rng(seed))
+
+    @staticmethod
+    def _make_jitter(jitter, distribution, rng):
+        if callable(distribution):
+            return distribution
+        if not jitter:
+            return None
+        if distribution == "uniform":
+            return lambda: rng.uniform(0, jitter)
+        if distribution == "normal":
+            return lambda: abs(rng.normal(0, jitter))
+        if distribution == "exponential":
+            return lambda: rng.exponential(jitter)
+        raise ValueError(f"Unknown jitter distribution {distribution!r}")
+
+    # [FUNCTION] Add the current value of the signal (timestamps must not decrease)
+    def push(self, value, t=None):
+        if t is None:
+            t = time.monotonic()
+        i = self.head % self.capacity
+        self.times[i] = t
+        self.values[i] = value
+        self.head += 1
+
+    # [FUNCTION] Value of the signal `delay` (+ jitter) seconds before time t
+    def sample(self, t=None):
+        if self.head == 0:
+            return self.initial
+        if t is None:
+            t = time.monotonic()
+        target = t - self.delay
+        if self.jitter is not None:
+            target -= self.jitter()
+        target = max(target, self.last_target)
+        self.last_target = target
+
+        times, values, cap = self.times, self.values, self.capacity
+        oldest = max(0, self.head - cap)
+        r = max(self.read, oldest)
+        while r + 1 < self.head and times[(r + 1) % cap] <= target:
+            r += 1
+        self.read = r
+
+        t0 = times[r % cap]
+        if target < t0:
+            # Nothing that old has been pushed yet (or it was overwritten)
+            return self.initial if r == 0 else values[r % cap]
+        if not self.interpolate or r + 1 >= self.head:
+            return values[r % cap]
+
+        t1 = times[(r + 1) % cap]
+        v0, v1 = values[r % cap], values[(r + 1) % cap]
+        if t1 <= t0:
+            return v1
+        return v0 + (target - t0) / (t1 - t0) * (v1 - v0)
+
+    # [FUNCTION] Forget all samples (e.g. when start() is pressed again)
+    def clear(self):
+        self.head = 0
+        self.read = 0
+        self.last_target = -math.inf
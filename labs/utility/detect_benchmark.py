@@ -0,0 +1,119 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: detect_benchmark.py
+
+Title: Detection Backend Benchmark
+
+Purpose: Compare detector latency across inference backends on the same frames, on the
+car or on a laptop without a TPU.
+
+Frames come from a recorded video, a folder of images, or (by default) the
+deterministic synthetic_frames() scene. Every backend is warmed up, then each frame is
+timed through preprocess, invoke and get_objects with a StageProfiler, and the rolling
+p50/p95/p99 per stage are printed. On the synthetic scene the mean IoU against the known
+boxes is reported as well, which makes a quick end-to-end check of the detection path.
+
+Usage:
+    python detect_benchmark.py --backend synthetic cpu --cpu-model ../model/machineVision_cpu.tflite
+    python detect_benchmark.py --backend edgetpu --frames run.mp4 --model ../model/machineVision.tflite
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+import inference_backend
+import stage_profiler
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] BGR frames from a video file or an image folder (at most count)
+def load_frames(path, count):
+    frames = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path))[:count]:
+            image = cv2.imread(os.path.join(path, name))
+            if image is not None:
+                frames.append(image)
+    else:
+        capture = cv2.VideoCapture(path)
+        while len(frames) < count:
+            ok, image = capture.read()
+            if not ok:
+                break
+            frames.append(image)
+        capture.release()
+    return frames
+
+
+# [FUNCTION] Time one backend over the frames -> (StageProfiler, mean IoU or None)
+def benchmark(backend, frames, truth=None, score_thresh=0.5, warmup=10):
+    for frame in frames[:warmup]:
+        backend.preprocess(frame)
+        backend.invoke()
+        backend.get_objects(score_thresh)
+
+    profiler = stage_profiler.StageProfiler(window=len(frames), dump_on_exit=False)
+    overlaps = []
+    for i, frame in enumerate(frames):
+        with profiler.stage("preprocess"):
+            backend.preprocess(frame)
+        with profiler.stage("invoke"):
+            backend.invoke()
+        with profiler.stage("get_objects"):
+            objs = backend.get_objects(score_thresh)
+
+        if truth is not None:
+            height, width = frame.shape[:2]
+            scale_x, scale_y = width / backend.input_size[0], height / backend.input_size[1]
+            best = max((inference_backend.iou(obj.bbox.scale(scale_x, scale_y), truth[i])
+                        for obj in objs), default=0.0)
+            overlaps.append(best)
+    return profiler, (float(np.mean(overlaps)) if overlaps else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-backend detection latency")
+    parser.add_argument("--backend", nargs="+", default=["synthetic"],
+                        choices=("edgetpu", "cpu", "synthetic"))
+    parser.add_argument("--frames", default=None, help="video file or image folder (default: synthetic scene)")
+    parser.add_argument("--count", type=int, default=300, help="number of frames")
+    parser.add_argument("--model", default=None, help="EdgeTPU-compiled .tflite model")
+    parser.add_argument("--cpu-model", default=None, help="un-compiled .tflite model for the cpu backend")
+    parser.add_argument("--labels", default=None)
+    parser.add_argument("--threads", type=int, default=None, help="CPU interpreter threads")
+    parser.add_argument("--score", type=float, default=0.5)
+    args = parser.parse_args()
+
+    truth = None
+    if args.frames is None:
+        frames, truth = inference_backend.synthetic_frames(args.count)
+    else:
+        frames = load_frames(args.frames, args.count)
+    print(f">> {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    for name in args.backend:
+        if name == "edgetpu":
+            backend = inference_backend.make_backend(name, args.model, args.labels)
+        elif name == "cpu":
+            backend = inference_backend.make_backend(name, args.cpu_model, args.labels,
+                                                     num_threads=args.threads)
+        else:
+            backend = inference_backend.make_backend(name)
+
+        profiler, overlap = benchmark(backend, frames, truth, args.score)
+        print(f"\n[{name}] input {backend.input_size[0]}x{backend.input_size[1]}")
+        print(profiler.report())
+        if overlap is not None:
+            print(f"mean IoU vs synthetic boxes: {overlap:.2f}")
@@ -0,0 +1,81 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: drive_coalescer.py
+
+Title: Drive Command Coalescer
+
+Purpose: Stop publishing the same drive command 60 times per second. Every
+rc.drive.set_speed_angle() call is a ROS publish, and most labs call it every frame
+even while the car is parked at (0, 0), e.g. hsv_tuner.py while sliders are moved.
+
+DriveCoalescer sits in front of rc.drive: a (speed, angle) pair is only forwarded when
+either value moved more than epsilon from the last one sent, or when keepalive seconds
+have passed since the last send, so the failsafe still sees a steady stream of commands.
+Speed and angle always go out together in one set_speed_angle() call. The number of
+sent and suppressed commands is counted for comparison.
+
+Usage:
+    drive = drive_coalescer.DriveCoalescer(rc.drive)
+    drive.set_speed_angle(speed, angle)   # instead of rc.drive.set_speed_angle(...)
+    print(drive.report())
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import time
+
+########################################################################################
+# Classes
+########################################################################################
+
+class DriveCoalescer:
+    """
+    Forwards drive commands only when they change or the keep-alive period expires.
+    """
+
+    def __init__(self, drive, epsilon=0.005, keepalive=0.1, clock=time.monotonic):
+        self.drive = drive
+        self.epsilon = epsilon  # smallest change in speed or angle that is sent
+        self.keepalive = keepalive  # s, resend an unchanged command at least this often
+        self.clock = clock
+        self.sent = 0
+        self.suppressed = 0
+        self.reset()
+
+    # [FUNCTION] Forget the last command so the next one is always sent
+    def reset(self):
+        self.last_speed = None
+        self.last_angle = None
+        self.last_sent = None
+
+    # [FUNCTION] Forward (speed, angle) if it changed or is due; returns True if published
+    def set_speed_angle(self, speed, angle, force=False):
+        now = self.clock()
+        if not force and self.last_sent is not None:
+            unchanged = (abs(speed - self.last_speed) <= self.epsilon
+                         and abs(angle - self.last_angle) <= self.epsilon)
+            if unchanged and now - self.last_sent < self.keepalive:
+                self.suppressed += 1
+                return False
+
+        self.drive.set_speed_angle(speed, angle)
+        self.last_speed = speed
+        self.last_angle = angle
+        self.last_sent = now
+        self.sent += 1
+        return True
+
+    # [FUNCTION] Stop the car immediately (never suppressed)
+    def stop(self):
+        self.set_speed_angle(0, 0, force=True)
+
+    # [FUNCTION] One-line summary of sent vs suppressed commands
+    def report(self):
+        total = self.sent + self.suppressed
+        share = 100 * self.suppressed / total if total else 0.0
+        return f"drive: {self.sent} sent, {self.suppressed} suppressed ({share:.0f}%)"
@@ -0,0 +1,234 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: gain_sweep.py
+
+Title: Closed-Loop Gain Sweep Simulator
+
+Purpose: Shortlist controller gains on a laptop before going to the track, instead of
+moving one slider at a time in hsv-p_tuner.py / ss-pd_tuner.py.
+
+Both loops are simulated with a kinematic bicycle model, vectorized in NumPy over every
+(kp, kd, speed) combination and several randomized trials at once:
+- "line": the line follower of hsv-p_tuner.py / lfss.py. The camera sees the line
+  LOOKAHEAD metres ahead, reports its column in pixels CAMERA_DELAY seconds late, and a
+  PD controller on the column error steers. Each trial starts at a random offset on a
+  straight line (overshoot and settling are measured there), then the line turns with
+  a random curvature for the second half. A crash is losing the line out of the image.
+- "stop": the LIDAR safety stop of ss-pd_tuner.py / lfss.py. The car drives at a wall
+  and a PD controller on the delayed distance error sets the speed through a
+  first-order motor lag. A crash is touching the wall.
+
+Each combination reports overshoot (%), settling time (s, into a 5% band) and crash
+rate over its trials. Gains are swept in the same units as the lab parameters
+(A_SENSE / S_SENSE in %), so the shortlist can be typed straight into lfss.py.
+
+The vehicle constants come from vehicle.py; the camera and motor constants below are
+estimates for the RACECAR Neo, adjust them if the simulated behaviour does not match
+the car.
+
+Usage:
+    python gain_sweep.py line --sense 10 100 19 --kd 0 0.004 5 --speed 0.2 1.0 5
+    python gain_sweep.py stop --sense 10 100 19 --kd 0 0.5 5 --speed 0.2 1.0 5
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import argparse
+import time
+
+import numpy as np
+
+from vehicle import MAX_SPEED, MAX_STEER, WHEELBASE
+
+########################################################################################
+# Constants (camera and motor model)
+########################################################################################
+
+DT = 1 / 60  # update() period (s)
+MOTOR_TAU = 0.15  # s, first-order speed response
+
+IMAGE_CENTER = 160  # px, setpoint used by the line followers
+PX_PER_M = 400  # px per metre of lateral offset at the look-ahead distance
+LOOKAHEAD = 0.4  # m, where the floor crop sees the line
+CAMERA_DELAY = 0.1  # s, exposure + processing latency
+LIDAR_DELAY = 0.1  # s
+PIXEL_NOISE = 2.0  # px standard deviation of the contour center
+MAX_CURVATURE = 0.6  # 1/m, tightest line curve in the trials (~1.7 m radius)
+
+SETTLE_BAND = 0.05  # settled when within 5% of the initial error...
+SETTLE_FLOOR_M = 0.02  # ...or 2 cm of the line, whichever is wider (pixel noise floor)
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Flattened grid of every (sense, kd, speed) combination, repeated per trial
+def make_grid(senses, kds, speeds, trials):
+    s, d, v = np.meshgrid(senses, kds, speeds, indexing="ij")
+    combos = np.stack([s.ravel(), d.ravel(), v.ravel()], axis=1)
+    return combos, np.repeat(combos, trials, axis=0)
+
+
+# [FUNCTION] Last time index outside the settle band -> settling time per run
+def settling_time(outside, dt):
+    steps = outside.shape[0]
+    last_outside = steps - 1 - np.argmax(outside[::-1], axis=0)
+    never = ~outside.any(axis=0)
+    settle = (last_outside + 1) * dt
+    settle[never] = 0.0
+    settle[outside[-1]] = np.inf  # still outside at the end of the run
+    return settle
+
+
+# [FUNCTION] Simulate the camera line follower for every run in parallel
+def simulate_line(sense, kd, speed, duration=10.0, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    n = len(sense)
+    steps = int(duration / DT)
+    delay_steps = max(1, int(round(CAMERA_DELAY / DT)))
+
+    # Same mapping as lfss.py: kp = -(2/setpoint) * A_SENSE/100 * 2
+    kp = -(2 / IMAGE_CENTER) * sense / 100 * 2
+    kd = -kd
+    v = speed * MAX_SPEED
+
+    y0 = rng.uniform(0.05, 0.15, n) * rng.choice([-1, 1], n)  # initial offset (m)
+    turn = rng.uniform(-MAX_CURVATURE, MAX_CURVATURE, n)  # 1/m, curvature of the second half
+    curvature = np.zeros(n)
+    y = y0.copy()  # offset of the line to the right of the car (m)
+    heading = np.zeros(n)  # car heading left of the line tangent (rad)
+    crashed = np.zeros(n, bool)
+
+    columns = np.full((delay_steps, n), float(IMAGE_CENTER))  # camera pipeline
+    prev_error = np.zeros(n)
+    min_signed = np.zeros(n)
+    outside = np.zeros((steps, n), bool)
+    band = np.maximum(SETTLE_BAND * np.abs(y0), SETTLE_FLOOR_M)
+
+    for k in range(steps):
+        if k == steps // 2:
+            curvature = turn
+
+        # Camera: column of the line LOOKAHEAD ahead, delivered delay_steps frames later
+        seen = y + LOOKAHEAD * np.sin(heading) + 0.5 * curvature * LOOKAHEAD ** 2
+        column = IMAGE_CENTER + PX_PER_M * seen + rng.normal(0, PIXEL_NOISE, n)
+        measured = columns[k % delay_steps].copy()
+        columns[k % delay_steps] = column
+
+        # PD controller on the column error (same sign convention as the labs)
+        error = IMAGE_CENTER - measured
+        derivative = (error - prev_error) / DT if k else 0.0
+        prev_error = error
+        angle = np.clip(kp * error + kd * derivative, -1, 1)
+
+        # Kinematic bicycle relative to the line (positive angle steers right, positive
+        # curvature bends the line to the right)
+        steer = angle * MAX_STEER
+        active = ~crashed
+        heading = heading + active * (v * curvature - v / WHEELBASE * np.tan(steer)) * DT
+        y = y + active * v * np.sin(heading) * DT
+
+        crashed |= np.abs(column - IMAGE_CENTER) > IMAGE_CENTER  # line left the image
+        if k < steps // 2:
+            min_signed = np.minimum(min_signed, y * np.sign(y0))
+            outside[k] = np.abs(y) > band
+
+    overshoot = 100 * -min_signed / np.abs(y0)
+    return overshoot, settling_time(outside[:steps // 2], DT), crashed
+
+
+# [FUNCTION] Simulate the LIDAR safety stop for every run in parallel
+def simulate_stop(sense, kd, speed, setpoint=50.0, duration=6.0, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    n = len(sense)
+    steps = int(duration / DT)
+    delay_steps = max(1, int(round(LIDAR_DELAY / DT)))
+
+    # Same mapping as lfss.py: kp_now = -1/SS_SETPOINT * S_SENSE/100 * 2
+    kp = -1 / setpoint * sense / 100 * 2
+
+    distance = rng.uniform(150, 300, n)  # cm
+    d0 = distance - setpoint
+    velocity = np.zeros(n)  # m/s
+    readings = np.repeat(distance[None, :], delay_steps, axis=0)
+    prev_error = np.zeros(n)
+    closest = distance.copy()
+    outside = np.zeros((steps, n), bool)
+    crashed = np.zeros(n, bool)
+
+    for k in range(steps):
+        measured = readings[k % delay_steps].copy()
+        readings[k % delay_steps] = distance + rng.normal(0, 1.0, n)
+
+        error = setpoint - measured
+        derivative = (error - prev_error) / DT if k else 0.0
+        prev_error = error
+        command = np.clip(kp * error - kd * derivative / setpoint, -speed, speed)
+        command = np.where(error > -setpoint, command, speed)  # full speed when far away
+
+        velocity += (command * MAX_SPEED - velocity) * DT / MOTOR_TAU
+        distance = distance - velocity * 100 * DT * ~crashed
+        crashed |= distance <= 0
+        closest = np.minimum(closest, distance)
+        outside[k] = np.abs(distance - setpoint) > SETTLE_BAND * d0
+
+    overshoot = 100 * np.maximum(setpoint - closest, 0) / setpoint
+    return overshoot, settling_time(outside, DT), crashed
+
+
+# [FUNCTION] Average trials per combination: (overshoot %, settling s, crash rate)
+def summarize(overshoot, settle, crashed, trials):
+    overshoot = overshoot.reshape(-1, trials)
+    settle = settle.reshape(-1, trials)
+    crash_rate = crashed.reshape(-1, trials).mean(axis=1)
+    ok = ~crashed.reshape(-1, trials)
+    survived = ok.sum(axis=1)
+    mean_overshoot = np.where(survived > 0, np.where(ok, overshoot, 0).sum(axis=1) / np.maximum(survived, 1), np.inf)
+    worst_settle = np.where(survived > 0, np.max(np.where(ok, settle, 0), axis=1), np.inf)
+    return mean_overshoot, worst_settle, crash_rate
+
+
+# [FUNCTION] Run a sweep and return (combos, overshoot, settling, crash_rate)
+def sweep(mode, senses, kds, speeds, trials=8, seed=0):
+    rng = np.random.default_rng(seed)
+    combos, runs = make_grid(senses, kds, speeds, trials)
+    simulate = simulate_line if mode == "line" else simulate_stop
+    results = simulate(runs[:, 0], runs[:, 1], runs[:, 2], rng=rng)
+    return (combos,) + summarize(*results, trials)
+
+
+# [FUNCTION] Print the best combinations: no crashes first, then fastest settling
+def print_shortlist(mode, combos, overshoot, settle, crash_rate, top=15):
+    order = np.lexsort((overshoot, settle, crash_rate))
+    sense_name = "A_SENSE" if mode == "line" else "S_SENSE"
+    print(f"{sense_name:>8} | {'kd':>7} | {'speed':>5} || {'overshoot':>9} | {'settle':>7} | crash")
+    for i in order[:top]:
+        s, d, v = combos[i]
+        print(f"{s:7.1f}% | {d:7.4f} | {v:5.2f} || {overshoot[i]:8.1f}% | {settle[i]:6.2f}s | {100 * crash_rate[i]:4.0f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized closed-loop gain sweep")
+    parser.add_argument("mode", choices=("line", "stop"))
+    parser.add_argument("--sense", type=float, nargs=3, default=(10, 100, 19),
+                        metavar=("MIN", "MAX", "N"), help="sensitivity in %% (A_SENSE / S_SENSE)")
+    parser.add_argument("--kd", type=float, nargs=3, default=None, metavar=("MIN", "MAX", "N"))
+    parser.add_argument("--speed", type=float, nargs=3, default=(0.2, 1.0, 5), metavar=("MIN", "MAX", "N"))
+    parser.add_argument("--trials", type=int, default=8)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.kd is None:
+        args.kd = (0, 0.004, 5) if args.mode == "line" else (0, 0.5, 5)
+    grid = [np.linspace(lo, hi, int(n)) for lo, hi, n in (args.sense, args.kd, args.speed)]
+
+    start = time.perf_counter()
+    combos, overshoot, settle, crash_rate = sweep(args.mode, *grid, trials=args.trials)
+    elapsed = time.perf_counter() - start
+    print(f">> Simulated {len(combos)} combinations x {args.trials} trials in {elapsed:.2f}s")
+    print_shortlist(args.mode, combos, overshoot, settle, crash_rate, args.top)
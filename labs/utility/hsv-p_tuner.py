@@ -24,14 +24,14 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import font as tkfont
 import threading
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 # If this file is nested inside a folder in the labs folder, the relative path should
 # be [1, ../../library] instead.
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import shm_plotter
+import async_log
 
 # Create RACECAR object
 rc = racecar_core.create_racecar()
@@ -53,7 +53,8 @@ CONTROL_PARAM = (tune_speed, tune_angle) # changes on user save
 
 global loc_history # variable to store history of detected locations
 hist_len = 300 # keep only 300 points ~10sec of data
-loc_history = [0] * hist_len # rolling queue (append to start, pop to remove)
+loc_history = shm_plotter.SharedRingBuffer(("loc",), hist_len) # rolling history, newest first
+plot_process = None # live plot process, replaced on every start()
 
 speed = 0.0  # The current speed of the car
 angle = 0.0  # The current angle of the car's wheels
@@ -62,42 +63,45 @@ contour_area = 0  # The area of contour
 
 MIN_CONTOUR_AREA = 30
 
+# Trackbar prints are coalesced and written by a background thread (latest value wins)
+logger = async_log.AsyncLogger(period=0.2)
+
 
 # Function to adjust values (you can replace these functions with actual processing logic)
 def on_low_h_change(val):
     global H_low
     H_low = int(float(val))
-    print(f"H_low: {H_low}")
+    logger.log("H_low: {}", H_low)
 
 
 def on_low_s_change(val):
     global S_low
     S_low = int(float(val))
-    print(f"S_low: {S_low}")
+    logger.log("S_low: {}", S_low)
 
 
 def on_low_v_change(val):
     global V_low
     V_low = int(float(val))
-    print(f"V_low: {V_low}")
+    logger.log("V_low: {}", V_low)
 
 
 def on_high_h_change(val):
     global H_high
     H_high = int(float(val))
-    print(f"H_high: {H_high}")
+    logger.log("H_high: {}", H_high)
 
 
 def on_high_s_change(val):
     global S_high
     S_high = int(float(val))
-    print(f"S_high: {S_high}")
+    logger.log("S_high: {}", S_high)
 
 
 def on_high_v_change(val):
     global V_high
     V_high = int(float(val))
-    print(f"V_high: {V_high}")
+    logger.log("V_high: {}", V_high)
 
 def on_speed_change(val): # val is between 0 and 100% -> map to 0 to 1
     global tune_speed
@@ -223,33 +227,11 @@ def create_gui():
 
     root.mainloop()
 
-# [FUNCTION] Function to graph data to screen - threaded
+# [FUNCTION] Function to graph data to screen - separate process
 def graph_data():
-    fig, ax = plt.subplots()
-    line, = ax.plot(range(hist_len), list(loc_history), label="Line Position")
-    setpoint_line = ax.axhline(y=160, color='red', linestyle='--', label='Setpoint')
-
-    # Set title and label
-    ax.set_title("Plot of Current Line Position vs. Frame #")
-    ax.set_xlabel("Frame Number")
-    ax.set_ylabel("Pixels (px)")
-
-    def update_plot(frame):
-        line.set_ydata(loc_history)
-        return line, setpoint_line
-
-    # Set plot limits
-    ax.set_ylim(0, 320)
-    ax.set_xlim(0, hist_len - 1)
-
-    # Add legend
-    ax.legend()
-
-    # Start animation
-    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
-    
-    # Show plot
-    plt.show()
+    return shm_plotter.start_plot_process(
+        loc_history, title="Plot of Current Line Position vs. Frame #", ylabel="Pixels (px)",
+        ylim=(0, 320), lines=[{"channel": "loc", "label": "Line Position"}], setpoint=160)
 
 # [FUNCTION] Update the contour_center and contour_area each frame and display image - threaded
 def update_contour(img):
@@ -288,14 +270,15 @@ def update_contour(img):
 
 # [FUNCTION] Start function isn't really needed here
 def start():
+    global plot_process
     # Set initial driving speed and angle
     rc.drive.set_speed_angle(0, 0)
 
-    # Thread it
+    # Plot in a separate process, GUI in a thread
+    shm_plotter.stop_plot_process(plot_process)
+    plot_process = graph_data()
     gui_thread = threading.Thread(target=create_gui)
     gui_thread.start()
-    graph_thread = threading.Thread(target=graph_data)
-    graph_thread.start()
 
     # Print start message
     print(
@@ -344,12 +327,10 @@ def update():
     # Send speed and angle commands to RACECAR when trigger is pressed
     if rc.controller.get_trigger(rc.controller.Trigger.RIGHT) > 0.1:
         rc.drive.set_speed_angle(speed, angle)
-        if len(loc_history) >= hist_len: # if size of history greater than spec 
-            loc_history.pop(-1) # remove last element and proceed with append
         if contour_center is not None:
-            loc_history.insert(0, contour_center[1])
+            loc_history.append(contour_center[1])
         else:
-            loc_history.insert(0, 0) # no detect
+            loc_history.append(0) # no detect
     else:
         rc.drive.set_speed_angle(0, 0)
 
@@ -27,6 +27,8 @@ import threading
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import async_log
+import drive_coalescer
 
 # Create RACECAR object
 rc = racecar_core.create_racecar()
@@ -50,42 +52,48 @@ contour_area = 0  # The area of contour
 
 MIN_CONTOUR_AREA = 30
 
+# Trackbar prints are coalesced and written by a background thread (latest value wins)
+logger = async_log.AsyncLogger(period=0.2)
+
+# Drive commands are only published when they change (plus a keep-alive for the failsafe)
+drive = drive_coalescer.DriveCoalescer(rc.drive)
+
 
 # Function to adjust values (you can replace these functions with actual processing logic)
 def on_low_h_change(val):
     global H_low
     H_low = int(float(val))
-    print(f"H_low: {H_low}")
+    logger.log("H_low: {}", H_low)
 
 
 def on_low_s_change(val):
     global S_low
     S_low = int(float(val))
-    print(f"S_low: {S_low}")
+    logger.log("S_low: {}", S_low)
 
 
 def on_low_v_change(val):
     global V_low
     V_low = int(float(val))
-    print(f"V_low: {V_low}")
+    logger.log("V_low: {}", V_low)
 
 
 def on_high_h_change(val):
     global H_high
     H_high = int(float(val))
-    print(f"H_high: {H_high}")
+    logger.log("H_high: {}", H_high)
 
 
 def on_high_s_change(val):
     global S_high
     S_high = int(float(val))
-    print(f"S_high: {S_high}")
+    logger.log("S_high: {}", S_high)
 
 
 def on_high_v_change(val):
     global V_high
     V_high = int(float(val))
-    print(f"V_high: {V_high}")
+    logger.log("V_high: {}", V_high)
 
 
 # [FUNCTION] Create a GUI (tkinter) to dynamically adjust HSV values
@@ -238,7 +246,7 @@ def update_contour(img):
 # [FUNCTION] Start function isn't really needed here
 def start():
     # Set initial driving speed and angle
-    rc.drive.set_speed_angle(0, 0)
+    drive.stop()
 
     # Start UI
     gui_thread = threading.Thread(target=create_gui)
@@ -296,8 +304,8 @@ def update():
     else:
         angle = 0
 
-    # Send speed and angle commands to RACECAR 
-    rc.drive.set_speed_angle(speed, angle)
+    # Send speed and angle commands to RACECAR (unchanged commands are coalesced)
+    drive.set_speed_angle(speed, angle)
 
     ######################
     # CONTROLLER OPTIONS #
@@ -350,6 +358,7 @@ def update():
     # When right bumper is pressed, print SPEED and ANGLE to terminal window
     if rc.controller.was_pressed(rc.controller.Button.RB):
         print(f"System Speed/Angle: Speed = {speed}, Angle = {angle}")
+        print(drive.report())
 
 
 ########################################################################################
@@ -0,0 +1,377 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: inference_backend.py
+
+Title: Object Detection Backends
+
+Purpose: One small interface for the object detector used by carfollower.py, so the
+detection path does not depend on pycoral directly and can run without a Coral TPU.
+
+Every backend exposes
+- input_size: (width, height) of the model input
+- labels: {class id: name}
+- set_input(rgb): copy an RGB uint8 image of input_size into the model input
+- preprocess(image): resize a BGR camera frame straight into the model input, as RGB
+- invoke(): run the model
+- get_objects(score_thresh): detections as objects with .id, .score and .bbox
+  (.xmin, .ymin, .xmax, .ymax in input pixels, .scale(sx, sy)), like pycoral's
+  detect.get_objects()
+
+Backends (make_backend() creates one by name):
+- "edgetpu", EdgeTpuBackend: the .tflite model on the Coral EdgeTPU through pycoral
+- "cpu", TfliteBackend: an SSD-style .tflite model on the CPU through tflite-runtime (or
+  TensorFlow Lite). It needs the model before EdgeTPU compilation: *_edgetpu.tflite
+  models contain a custom op only the TPU can run
+- "synthetic", SyntheticBackend: a deterministic CPU stand-in that "detects" the largest
+  blob of a colour range, optionally sleeping to mimic TPU latency. With
+  synthetic_frames() it gives tests a detector with known answers
+
+preprocess() replaces cvtColor -> resize -> tobytes() -> run_inference(), which makes
+three full-size copies per frame. It resizes directly into a NumPy view of the
+interpreter's input tensor (interpreter.tensor() on input_details) and then swaps the
+channels in place, so the only write is into the tensor itself. The view is dropped
+before invoke(), which TFLite requires. Run this file to benchmark both paths. (The
+threaded InferencePipeline preprocesses into its own buffers instead and copies them in
+with set_input(); see inference_pipeline.py.)
+
+Backends are not thread-safe: call preprocess/set_input/invoke/get_objects from one
+thread.
+
+Usage:
+    backend = inference_backend.EdgeTpuBackend(model_path, label_path)
+    backend.preprocess(image)
+    backend.invoke()
+    objs = backend.get_objects(0.5)
+
+    python inference_backend.py    # preprocessing microbenchmark
+    python detect_benchmark.py     # per-backend latency on recorded frames
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import argparse
+import collections
+import time
+
+import cv2
+import numpy as np
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Resize a BGR frame into dst (H x W x 3 uint8, e.g. a tensor view) as RGB
+def preprocess_into(image, dst):
+    height, width = dst.shape[:2]
+    cv2.resize(image, (width, height), dst=dst)
+    cv2.cvtColor(dst, cv2.COLOR_BGR2RGB, dst=dst)  # in place, no extra buffer
+
+
+# [FUNCTION] Deterministic BGR frames of a red box moving on a grey floor -> (frames, boxes)
+def synthetic_frames(count, size=(640, 480), box=(80, 60), seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    frames, boxes = [], []
+    x, y = width / 2, height / 2
+    vx, vy = rng.uniform(-6, 6, 2)
+    for _ in range(count):
+        x = min(max(x + vx, box[0] / 2), width - box[0] / 2)
+        y = min(max(y + vy, box[1] / 2), height - box[1] / 2)
+        if not box[0] / 2 < x < width - box[0] / 2:
+            vx = -vx
+        if not box[1] / 2 < y < height - box[1] / 2:
+            vy = -vy
+        frame = np.full((height, width, 3), 90, np.uint8)
+        x0, y0 = int(x - box[0] / 2), int(y - box[1] / 2)
+        cv2.rectangle(frame, (x0, y0), (x0 + box[0], y0 + box[1]), (30, 30, 220), -1)
+        frames.append(frame)
+        boxes.append(BBox(x0, y0, x0 + box[0], y0 + box[1]))
+    return frames, boxes
+
+
+# [FUNCTION] Intersection over union of two bboxes (anything with xmin/ymin/xmax/ymax)
+def iou(a, b):
+    width = min(a.xmax, b.xmax) - max(a.xmin, b.xmin)
+    height = min(a.ymax, b.ymax) - max(a.ymin, b.ymin)
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    union = ((a.xmax - a.xmin) * (a.ymax - a.ymin) + (b.xmax - b.xmin) * (b.ymax - b.ymin) - inter)
+    return inter / union if union > 0 else 0.0
+
+
+# [FUNCTION] Create a backend by name: "edgetpu", "cpu" or "synthetic"
+def make_backend(name, model_path=None, label_path=None, **kwargs):
+    if name == "edgetpu":
+        return EdgeTpuBackend(model_path, label_path)
+    if name == "cpu":
+        return TfliteBackend(model_path, label_path, **kwargs)
+    if name == "synthetic":
+        return SyntheticBackend(**kwargs)
+    raise ValueError(f"Unknown inference backend {name!r}")
+
+
+# [FUNCTION] {id: name} from a label file of "name" or "id name" lines (pycoral format)
+def read_labels(path):
+    labels = {}
+    with open(path) as f:
+        for row, line in enumerate(f):
+            parts = line.strip().split(maxsplit=1)
+            if not parts:
+                continue
+            if len(parts) == 2 and parts[0].isdigit():
+                labels[int(parts[0])] = parts[1]
+            else:
+                labels[row] = line.strip()
+    return labels
+
+########################################################################################
+# Classes
+########################################################################################
+
+class BBox(collections.namedtuple("BBox", ["xmin", "ymin", "xmax", "ymax"])):
+    """
+    Bounding box with the same fields and scale() as pycoral.adapters.detect.BBox.
+    """
+
+    __slots__ = ()
+
+    # [FUNCTION] Box with x scaled by sx and y scaled by sy
+    def scale(self, sx, sy):
+        return BBox(self.xmin * sx, self.ymin * sy, self.xmax * sx, self.ymax * sy)
+
+    # [FUNCTION] Box moved by (dx, dy)
+    def translate(self, dx, dy):
+        return BBox(self.xmin + dx, self.ymin + dy, self.xmax + dx, self.ymax + dy)
+
+
+# Detection with the same fields as pycoral.adapters.detect.Object
+Object = collections.namedtuple("Object", ["id", "score", "bbox"])
+
+
+class EdgeTpuBackend:
+    """
+    Detection model on the Coral EdgeTPU (requires pycoral).
+    """
+
+    def __init__(self, model_path, label_path=None):
+        from pycoral.adapters import common, detect
+        from pycoral.utils.dataset import read_label_file
+        from pycoral.utils.edgetpu import make_interpreter
+
+        self._common = common
+        self._detect = detect
+        self.interpreter = make_interpreter(model_path)
+        self.interpreter.allocate_tensors()
+        self.labels = read_label_file(label_path) if label_path else {}
+        self.input_size = common.input_size(self.interpreter)
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+
+    # [FUNCTION] Writable H x W x 3 view of the input tensor; drop it before invoke()
+    def input_tensor(self):
+        return self.interpreter.tensor(self.input_index)()[0]
+
+    # [FUNCTION] Copy an RGB image of input_size into the input tensor
+    def set_input(self, rgb):
+        self._common.set_input(self.interpreter, rgb)
+
+    # [FUNCTION] Resize a BGR camera frame straight into the input tensor as RGB
+    def preprocess(self, image):
+        tensor = self.input_tensor()
+        preprocess_into(image, tensor)
+        del tensor  # TFLite refuses to invoke while views of its buffers are alive
+
+    # [FUNCTION] Run the model on the current input
+    def invoke(self):
+        self.interpreter.invoke()
+
+    # [FUNCTION] Detections above score_thresh, bboxes in input pixels
+    def get_objects(self, score_thresh):
+        return self._detect.get_objects(self.interpreter, score_thresh)
+
+
+class TfliteBackend:
+    """
+    SSD-style detection model on the CPU (requires tflite-runtime or TensorFlow).
+    """
+
+    def __init__(self, model_path, label_path=None, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.labels = read_labels(label_path) if label_path else {}
+        details = self.interpreter.get_input_details()[0]
+        if details["dtype"] != np.uint8:
+            raise ValueError("TfliteBackend expects a quantized model with uint8 input")
+        self.input_index = details["index"]
+        _, height, width, _ = details["shape"]
+        self.input_size = (int(width), int(height))
+        self.outputs = self._output_indices()
+
+    # [FUNCTION] Writable H x W x 3 view of the input tensor; drop it before invoke()
+    def input_tensor(self):
+        return self.interpreter.tensor(self.input_index)()[0]
+
+    # [FUNCTION] Copy an RGB image of input_size into the input tensor
+    def set_input(self, rgb):
+        tensor = self.input_tensor()
+        np.copyto(tensor, rgb)
+        del tensor
+
+    # [FUNCTION] Resize a BGR camera frame straight into the input tensor as RGB
+    def preprocess(self, image):
+        tensor = self.input_tensor()
+        preprocess_into(image, tensor)
+        del tensor
+
+    # [FUNCTION] Run the model on the current input
+    def invoke(self):
+        self.interpreter.invoke()
+
+    # [FUNCTION] (boxes, class ids, scores, count) output indices of TFLite_Detection_PostProcess
+    def _output_indices(self):
+        details = self.interpreter.get_output_details()
+        if len(details) != 4:
+            raise ValueError("TfliteBackend expects an SSD model with 4 outputs "
+                             "(TFLite_Detection_PostProcess)")
+
+        # Named outputs: TFLite_Detection_PostProcess, :1, :2, :3 = boxes, classes, scores, count
+        by_name = {detail["name"]: detail["index"] for detail in details}
+        names = ["TFLite_Detection_PostProcess"] + [f"TFLite_Detection_PostProcess:{i}" for i in (1, 2, 3)]
+        if all(name in by_name for name in names):
+            return tuple(by_name[name] for name in names)
+
+        # Otherwise the fixed output order, told apart by shape like pycoral's get_objects():
+        # TF1 exports are (boxes, classes, scores, count), TF2 exports (scores, boxes, count, classes)
+        indices = [detail["index"] for detail in details]
+        if int(np.prod(details[3]["shape"])) == 1:
+            return indices[0], indices[1], indices[2], indices[3]
+        return indices[1], indices[3], indices[0], indices[2]
+
+    # [FUNCTION] Detections above score_thresh, bboxes in input pixels
+    def get_objects(self, score_thresh):
+        boxes_index, ids_index, scores_index, count_index = self.outputs
+        get = self.interpreter.get_tensor
+        boxes, ids, scores = get(boxes_index)[0], get(ids_index)[0], get(scores_index)[0]
+        count = int(get(count_index).ravel()[0])
+
+        width, height = self.input_size
+        objects = []
+        for i in range(min(count, len(scores))):
+            if scores[i] >= score_thresh:
+                ymin, xmin, ymax, xmax = boxes[i]
+                bbox = BBox(max(0.0, xmin) * width, max(0.0, ymin) * height,
+                            min(1.0, xmax) * width, min(1.0, ymax) * height)
+                objects.append(Object(int(ids[i]), float(scores[i]), bbox))
+        return objects
+
+
+class SyntheticBackend:
+    """
+    CPU stand-in: reports the largest blob inside an RGB colour range as one detection.
+    """
+
+    def __init__(self, input_size=(300, 300), rgb_low=(150, 0, 0), rgb_high=(255, 90, 90),
+                 latency=0.0, min_area=20, labels=None):
+        self.input_size = tuple(input_size)
+        self.labels = labels if labels is not None else {0: "car"}
+        self.rgb_low = np.array(rgb_low, np.uint8)
+        self.rgb_high = np.array(rgb_high, np.uint8)
+        self.latency = latency  # s, simulated inference time
+        self.min_area = min_area
+        width, height = self.input_size
+        self.input = np.zeros((height, width, 3), np.uint8)
+        self.mask = np.zeros((height, width), np.uint8)
+        self.objects = []
+
+    # [FUNCTION] Writable H x W x 3 view of the input buffer
+    def input_tensor(self):
+        return self.input
+
+    # [FUNCTION] Copy an RGB image of input_size into the input buffer
+    def set_input(self, rgb):
+        np.copyto(self.input, rgb)
+
+    # [FUNCTION] Resize a BGR camera frame straight into the input buffer as RGB
+    def preprocess(self, image):
+        preprocess_into(image, self.input)
+
+    # [FUNCTION] Find the largest in-range blob (plus the simulated latency)
+    def invoke(self):
+        start = time.perf_counter()
+        cv2.inRange(self.input, self.rgb_low, self.rgb_high, dst=self.mask)
+        contours, _ = cv2.findContours(self.mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self.objects = []
+        if contours:
+            contour = max(contours, key=cv2.contourArea)
+            area = cv2.contourArea(contour)
+            if area >= self.min_area:
+                x, y, w, h = cv2.boundingRect(contour)
+                score = min(1.0, area / (w * h)) if w * h else 0.0
+                self.objects = [Object(0, score, BBox(x, y, x + w, y + h))]
+        remaining = self.latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    # [FUNCTION] Detections above score_thresh, bboxes in input pixels
+    def get_objects(self, score_thresh):
+        return [obj for obj in self.objects if obj.score >= score_thresh]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocessing microbenchmark")
+    parser.add_argument("--model", default=None, help="EdgeTPU .tflite model (default: CPU stand-in)")
+    parser.add_argument("--frames", type=int, default=500, help="frames per repeat")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--camera", type=int, nargs=2, default=(640, 480), metavar=("W", "H"))
+    args = parser.parse_args()
+
+    backend = make_backend("edgetpu", args.model) if args.model else SyntheticBackend()
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (args.camera[1], args.camera[0], 3), np.uint8)
+
+    # [FUNCTION] Old path: cvtColor + resize into new arrays, then tobytes() and a copy in
+    def copy_path():
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        resized = cv2.resize(rgb, backend.input_size)
+        data = resized.tobytes()
+        width, height = backend.input_size
+        backend.set_input(np.frombuffer(data, np.uint8).reshape(height, width, 3))
+
+    # [FUNCTION] New path: resize into the input tensor and swap channels in place
+    def direct_path():
+        backend.preprocess(frame)
+
+    # Alternate the paths over several repeats and keep the median, so load on the
+    # machine affects both the same way
+    paths = (("cvtColor+resize+tobytes", copy_path), ("resize into tensor", direct_path))
+    times = {name: [] for name, _ in paths}
+    for _, fn in paths:
+        for _ in range(20):
+            fn()
+    for _ in range(args.repeats):
+        for name, fn in paths:
+            start = time.perf_counter()
+            for _ in range(args.frames):
+                fn()
+            times[name].append(1e6 * (time.perf_counter() - start) / args.frames)
+
+    height, width = frame.shape[:2]
+    print(f"{width}x{height} frame -> {backend.input_size[0]}x{backend.input_size[1]} input, "
+          f"OpenCV {cv2.__version__} ({cv2.getNumThreads()} threads), median of {args.repeats}")
+    results = {}
+    for name, samples in times.items():
+        results[name] = float(np.median(samples))
+        print(f"{name:<24} {results[name]:8.1f} us/frame  (min {min(samples):.1f})")
+
+    old, new = results.values()
+    print(f"saving: {old - new:.1f} us/frame ({100 * (old - new) / old:.0f}%)")
@@ -0,0 +1,250 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: inference_pipeline.py
+
+Title: Pipelined Object Detection
+
+Purpose: Take object detection out of the control loop. Run serially, update() waits
+for colour conversion, resize, inference and decoding before it can steer, so the whole
+inference latency is added to every control step.
+
+The pipeline runs three stages on their own threads:
+1. preprocess: the newest submitted frame is resized and converted to RGB directly into
+   one of two input buffers (double buffering: one can be filled while the other is
+   inferred)
+2. infer: the newest filled buffer is copied into the interpreter's input tensor
+   (set_input) and the backend (see inference_backend.py) runs and decodes its
+   detections; only this thread touches the interpreter
+3. postprocess: bboxes are mapped back to camera pixels and the result is published to
+   a latest-detection slot (and an optional on_detection callback)
+
+A frame can be submitted with a region of interest, e.g. around the tracked bbox from
+roi_around(): only that region is resized into the model input, so a distant object
+covers many more input pixels. Detections are mapped back through the region's offset
+and scale factors.
+
+Unlike the serial path in carfollower.py (backend.preprocess(), which resizes straight
+into the input tensor), the pipeline therefore makes one extra model-sized copy per
+frame (about 270 KB for 300x300). That is the price of double buffering: the next
+frame can be preprocessed while the tensor is still being inferred, which matters more
+than the copy.
+
+Stages never queue up work: a frame that is replaced before it is preprocessed, or a
+buffer that is replaced before it is inferred, is dropped and counted. update() submits
+every frame and steers on latest() without ever waiting for the detector.
+
+An exception in a stage (e.g. a backend error) drops that frame, is counted in errors
+(the first one is printed) and the stage carries on. latest() then stops changing, so
+callers should check the age of the Detection (its timestamp) before steering on it.
+
+Usage:
+    pipeline = inference_pipeline.InferencePipeline(backend, score_thresh=0.5)
+    pipeline.submit(image)             # in update(), never blocks
+    pipeline.submit(image, roi=inference_pipeline.roi_around(track.bbox, image.shape,
+                                                             backend.input_size))
+    detection = pipeline.latest()      # newest Detection or None
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+import inference_backend
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Region (x0, y0, x1, y1) around bbox with the model's aspect ratio, inside the image
+def roi_around(bbox, image_shape, input_size, margin=1.0, min_width=None):
+    height, width = image_shape[:2]
+    in_width, in_height = input_size
+    aspect = in_width / in_height
+    if min_width is None:
+        min_width = in_width  # never crop below 1:1 model pixels by default
+
+    # Box plus `margin` box sizes on every side, widened to the input aspect ratio
+    box_w, box_h = bbox.xmax - bbox.xmin, bbox.ymax - bbox.ymin
+    roi_w = max(box_w * (1 + 2 * margin), box_h * (1 + 2 * margin) * aspect, min_width)
+    roi_w = min(roi_w, width, height * aspect)
+    roi_h = roi_w / aspect
+
+    # Centre on the box, shifted to stay inside the image
+    cx, cy = (bbox.xmin + bbox.xmax) / 2, (bbox.ymin + bbox.ymax) / 2
+    x0 = int(round(min(max(cx - roi_w / 2, 0), width - roi_w)))
+    y0 = int(round(min(max(cy - roi_h / 2, 0), height - roi_h)))
+    return x0, y0, x0 + int(round(roi_w)), y0 + int(round(roi_h))
+
+########################################################################################
+# Classes
+########################################################################################
+
+# Objects are in camera pixels; timestamp is when the frame was submitted
+Detection = collections.namedtuple("Detection", ["objects", "seq", "timestamp", "latency"])
+
+# How a buffer maps back to the camera image: camera = input * scale + offset
+FrameInfo = collections.namedtuple("FrameInfo", ["seq", "timestamp", "scale_x", "scale_y",
+                                                 "offset_x", "offset_y"])
+
+
+class InferencePipeline:
+    """
+    Three-thread preprocess / infer / postprocess pipeline with a latest-detection slot.
+    """
+
+    def __init__(self, backend, score_thresh=0.5, max_objects=1, on_detection=None):
+        self.backend = backend
+        self.score_thresh = score_thresh
+        self.max_objects = max_objects
+        self.on_detection = on_detection  # called with each Detection on the postprocess thread
+
+        width, height = backend.input_size
+        self.buffers = [np.zeros((height, width, 3), np.uint8) for _ in range(2)]
+
+        self.lock = threading.Condition()
+        self.running = True
+        self.frame = None  # newest submitted frame
+        self.frame_roi = None
+        self.frame_seq = 0
+        self.frame_time = 0.0
+        self.pending = None  # (buffer index, FrameInfo) waiting for inference
+        self.busy = None  # buffer index being inferred
+        self.results = collections.deque(maxlen=1)  # (objects, FrameInfo) for postprocess
+        self.detection = None
+
+        self.submitted = 0
+        self.dropped = 0
+        self.inferences = 0
+        self.errors = 0
+        self.last_error = None
+
+        self.threads = [threading.Thread(target=target, name=name, daemon=True)
+                        for name, target in (("preprocess", self._preprocess_loop),
+                                             ("infer", self._infer_loop),
+                                             ("postprocess", self._postprocess_loop))]
+        for thread in self.threads:
+            thread.start()
+
+    # [FUNCTION] Hand the newest camera frame (optionally only roi = (x0, y0, x1, y1)) to the pipeline;
+    # the frame is read later on the preprocess thread, so do not draw on it after submitting
+    def submit(self, image, roi=None):
+        with self.lock:
+            if self.frame is not None:
+                self.dropped += 1  # previous frame was never preprocessed
+            self.frame = image
+            self.frame_roi = roi
+            self.frame_seq += 1
+            self.frame_time = time.monotonic()
+            self.submitted += 1
+            self.lock.notify_all()
+
+    # [FUNCTION] Newest Detection, or None before the first inference finishes (check its timestamp)
+    def latest(self):
+        return self.detection
+
+    # [FUNCTION] Stop the stage threads
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.lock.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    # [FUNCTION] Resize + BGR->RGB a frame (or its roi) into buffer; returns the FrameInfo for it
+    def preprocess(self, image, buffer, seq, timestamp, roi=None):
+        if roi is None:
+            roi = (0, 0, image.shape[1], image.shape[0])
+        x0, y0, x1, y1 = roi
+        in_width, in_height = self.backend.input_size
+        inference_backend.preprocess_into(image[y0:y1, x0:x1], buffer)  # slicing is a view
+        return FrameInfo(seq, timestamp, (x1 - x0) / in_width, (y1 - y0) / in_height, x0, y0)
+
+    def _failed(self, stage, error):
+        with self.lock:
+            if self.errors == 0:
+                print(f">> Inference pipeline {stage} raised {error!r} (further errors are only counted)")
+            self.errors += 1
+            self.last_error = error
+
+    def _preprocess_loop(self):
+        while True:
+            with self.lock:
+                while self.running and self.frame is None:
+                    self.lock.wait()
+                if not self.running:
+                    return
+                image, roi = self.frame, self.frame_roi
+                seq, timestamp = self.frame_seq, self.frame_time
+                self.frame = None
+
+                # Fill the buffer that is not being inferred, taking it back if pending
+                index = 0 if self.busy != 0 else 1
+                if self.pending is not None:
+                    self.dropped += 1
+                    self.pending = None
+
+            try:
+                info = self.preprocess(image, self.buffers[index], seq, timestamp, roi)
+            except Exception as error:
+                self._failed("preprocess", error)
+                continue
+
+            with self.lock:
+                self.pending = (index, info)
+                self.lock.notify_all()
+
+    def _infer_loop(self):
+        backend = self.backend
+        while True:
+            with self.lock:
+                while self.running and self.pending is None:
+                    self.lock.wait()
+                if not self.running:
+                    return
+                index, info = self.pending
+                self.pending = None
+                self.busy = index
+
+            try:
+                backend.set_input(self.buffers[index])
+                backend.invoke()
+                objects = backend.get_objects(self.score_thresh)[:self.max_objects]
+            except Exception as error:
+                objects = None
+                self._failed("inference", error)
+
+            with self.lock:
+                self.busy = None
+                if objects is not None:
+                    self.inferences += 1
+                    self.results.append((objects, info))
+                self.lock.notify_all()
+
+    def _postprocess_loop(self):
+        while True:
+            with self.lock:
+                while self.running and not self.results:
+                    self.lock.wait()
+                if not self.running:
+                    return
+                objects, info = self.results.popleft()
+
+            try:
+                mapped = [obj._replace(bbox=obj.bbox.scale(info.scale_x, info.scale_y)
+                                       .translate(info.offset_x, info.offset_y))
+                          for obj in objects]
+                detection = Detection(mapped, info.seq, info.timestamp, time.monotonic() - info.timestamp)
+                self.detection = detection
+                if self.on_detection is not None:
+                    self.on_detection(detection)
+            except Exception as error:
+                self._failed("postprocess", error)
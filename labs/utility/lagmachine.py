@@ -23,9 +23,6 @@ import sys
 import tkinter as tk
 from tkinter import ttk
 from tkinter import font as tkfont
-import threading
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 import math
 import time
 
@@ -34,6 +31,10 @@ import time
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import shm_plotter
+import loop_monitor
+import delay_line
+import smith_predictor
 
 ########################################################################################
 # Global variables
@@ -56,53 +57,45 @@ CROP_FLOOR = ((300, 0), (rc.camera.get_height(), rc.camera.get_width()))
 # HSV Color Thresholds
 BLUE = ((90, 150, 150), (120, 255, 255))  # The HSV range for the color blue
 
-global error_history # variable to store history of detected locations
+global history # variable to store history of detected locations and angle cmds sent out
 hist_len = 300 # keep only 300 points ~10sec of data
-error_history = [0] * hist_len # rolling queue (append to start, pop from back to remove) for error history
-cmd_history = [0] * hist_len # rolling queue (append to start, pop from back to remove) for angle cmd sent out
+history = shm_plotter.SharedRingBuffer(("error", "cmd", "predicted"), hist_len) # rolling history, newest first
+plot_process = None # live plot process, replaced on every start()
 
 global queue
-LAGTIME = 0.25 # seconds of lag desired ### CHANGE ME ###
-queue = [0] * int(LAGTIME * 60)
+LAGTIME = 0.25 # seconds of lag desired on the steering command ### CHANGE ME ###
+SENSOR_LAG = 0.0 # seconds of lag on the camera measurement (line position) ### CHANGE ME ###
+JITTER = 0.0 # seconds of random extra lag added on top of each delay ### CHANGE ME ###
+JITTER_DISTRIBUTION = "uniform" # "uniform", "normal" or "exponential"
+
+# Timestamped delay lines: the lag is exact at any frame rate, not LAGTIME * 60 frames
+queue = delay_line.DelayLine(LAGTIME, jitter=JITTER, distribution=JITTER_DISTRIBUTION)
+camera_queue = delay_line.DelayLine(SENSOR_LAG, interpolate=False, initial=math.nan,
+                                    jitter=JITTER, distribution=JITTER_DISTRIBUTION)
+
+# Smith predictor: compensates LAGTIME + SENSOR_LAG using an internal model of the car
+COMPENSATE = False # True = Smith predictor, False = plain P-controller ### CHANGE ME ###
+PLANT_GAIN = 800 # Line drift in px/s per unit of steering angle at speed 1 ### CHANGE ME ###
+smith = smith_predictor.SmithPredictor(kp=-0.003125, plant_gain=PLANT_GAIN, delay=LAGTIME + SENSOR_LAG)
+
+# Measures the loop rate the controller is actually running at
+PROFILE = False # Print the loop rate / jitter report every second ### CHANGE ME ###
+monitor = loop_monitor.LoopMonitor(period=1/60)
 
 ########################################################################################
 # Functions
 ########################################################################################
 
-# [FUNCTION] Function to graph data to screen - threaded
+# [FUNCTION] Function to graph data to screen - separate process
 def graph_error_data():
-    fig, ax = plt.subplots()
-    ax2 = ax.twinx()
-    error_line, = ax.plot(range(hist_len), list(error_history), label="Line Position")
-    control_line, = ax2.plot(range(hist_len), list(cmd_history), color='tab:orange', label="Control Output u(t)")
-    setpoint_line = ax.axhline(y=0, color='red', linestyle='--', label='Reference')
-
-    # Set title and label
-    ax.set_title("Plot of Current Error & Control Output vs. Frame #")
-    ax.set_xlabel("Frame Number")
-    ax.set_ylabel("Pixels (px)")
-    ax2.set_ylabel("Control Output u(t)")
-    ax2.set_ylim(-1, 1)
-
-    def update_plot(frame):
-        error_line.set_ydata(error_history)
-        control_line.set_ydata(cmd_history)
-        return error_line, control_line, setpoint_line
-
-    # Set plot limits
-    ax.set_ylim(-320, 320)
-    ax.set_xlim(0, hist_len - 1)
-
-    # Add legend
-    lines   = [error_line, control_line, setpoint_line]
-    labels  = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc="upper right")
-
-    # Start animation
-    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
-    
-    # Show plot
-    plt.show()
+    predicted = [{"channel": "predicted", "label": "Smith Predicted Position", "color": "tab:green",
+                  "linestyle": ":"}] if COMPENSATE else []
+    return shm_plotter.start_plot_process(
+        history, title="Plot of Current Error & Control Output vs. Frame #", ylabel="Pixels (px)",
+        ylim=(-320, 320), lines=[{"channel": "error", "label": "Line Position"}] + predicted,
+        setpoint=0, setpoint_label="Reference",
+        twin={"ylabel": "Control Output u(t)", "ylim": (-1, 1),
+              "lines": [{"channel": "cmd", "label": "Control Output u(t)", "color": "tab:orange"}]})
 
 # [FUNCTION] Update the contour_center and contour_area each frame and display image
 def update_contour():
@@ -143,11 +136,13 @@ def update_contour():
 
 # [FUNCTION] The start function is run once every time the start button is pressed
 def start():
+    global plot_process
     # Set initial driving speed and angle
     rc.drive.set_speed_angle(0, 0)
+    smith.reset()
 
-    e_thread = threading.Thread(target=graph_error_data)
-    e_thread.start()
+    shm_plotter.stop_plot_process(plot_process)
+    plot_process = graph_error_data()
 
 # [FUNCTION] After start() is run, this function is run once every frame (ideally at
 # 60 frames per second or slower depending on processing speed) until the back button
@@ -156,50 +151,60 @@ def update():
     global speed, angle
     global error
 
+    # Record the loop period for the jitter report in update_slow()
+    monitor.tick(rc.get_delta_time())
+
     # Process the image
     update_contour()
+    now = time.monotonic()
+
+    # Find the column from (row, col), as seen SENSOR_LAG seconds ago (NaN = no detect)
+    present_value = contour_center[1] if contour_center is not None else math.nan
+    if SENSOR_LAG > 0:
+        camera_queue.push(present_value, now)
+        present_value = camera_queue.sample(now)
 
     # Proportional Controller
-    if contour_center is not None:
+    if not math.isnan(present_value):
         # Control Parameters
         setpoint = rc.camera.get_width() // 2
-        present_value = contour_center[1] # Find the column from (row, col)
         error = setpoint - present_value
 
-        # P-control equation
-        kp = -0.003125
-        angle = kp * error
+        if not COMPENSATE:
+            # P-control equation
+            kp = -0.003125
+            angle = kp * error
 
-        angle = rc_utils.clamp(angle, -1, 1)
+            angle = rc_utils.clamp(angle, -1, 1)
+
+    # Smith predictor (same gain) acting on the error predicted past the delay; it
+    # also runs without a detection to keep its model in step with the held command
+    if COMPENSATE:
+        detected = not math.isnan(present_value)
+        angle = smith.step(error if detected else None, rc.get_delta_time(), now)
+
+    # Add the new angle to the queue and send out the one requested LAGTIME seconds ago
+    queue.push(angle, now)
+    delayed_angle = queue.sample(now)
 
     # Drive the car
     speed = 1
-    rc.drive.set_speed_angle(speed, queue[0])
+    rc.drive.set_speed_angle(speed, delayed_angle)
 
-    # Update data to error history list
-    if len(error_history) >= hist_len: # if size of history greater than spec 
-        error_history.pop(-1) # remove last element and proceed with append
-    if contour_center is not None:
-        error_history.insert(0, -error) # negate error to match sign of control
+    # Update error (negated to match sign of control, 0 if no detect) and the current
+    # angle that is being sent out to the history
+    if not math.isnan(present_value):
+        history.append(-error, delayed_angle, -smith.predicted)
     else:
-        error_history.insert(0, 0) # no detect
-
-    # Update data to commanded history list
-    if len(cmd_history) >= hist_len:
-        cmd_history.pop(-1)
-    cmd_history.insert(0, queue[0]) # return the current angle that is being sent out
-
-    # Update the queue of angles being sent
-    queue.pop(0) # remove first element
-    queue.append(angle) # add angle to last element
-    # print(f"Queue: {queue}")
+        history.append(0, delayed_angle, -smith.predicted)
 
 
 # [FUNCTION] update_slow() is similar to update() but is called once per second by
 # default. It is especially useful for printing debug messages, since printing a 
 # message every frame in update is computationally expensive and creates clutter
 def update_slow():
-    pass # Remove 'pass and write your source code for the update_slow() function here
+    if PROFILE:
+        print(monitor.report())
 
 
 ########################################################################################
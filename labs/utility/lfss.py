@@ -19,6 +19,7 @@ enable the RACECAR to complete the line following challenge with safety stop.
 ########################################################################################
 
 import sys
+import time
 import cv2 as cv
 import numpy as np
 
@@ -27,6 +28,19 @@ import numpy as np
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import lidar_log
+import telemetry_udp
+import run_recorder
+import async_log
+import stage_profiler
+import loop_monitor
+import perf_hud
+import pid
+import pure_pursuit
+import speed_scheduler
+import steering_estimator
+import drive_coalescer
+import task_scheduler
 
 ########################################################################################
 # CHANGE ME (Parameters)
@@ -41,12 +55,23 @@ V_HIGH = 255 # Value higher value between 0 - 255
 
 A_SENSE = 50 # Angle sensitivity between 0% and 100%
 A_OFFSET = 0 # Angle offset scaled from -1 to 1
+STEER_MODE = "p" # "p" = P-controller on the contour column, "pursuit" = pure pursuit on the floor crop
+IMU_ASSIST = False # P-controller steers on a gyro-propagated line estimate, updated every frame
 
 S_VALUE = 50 # Speed magnitude as a percent from 0% to 100%
 S_SENSE = 50 # Speed sensitivity between 0% and 100%
+SPEED_SCHEDULE = False # Slow down for curves: S_VALUE on straights down to S_MIN in the tightest corners
+S_MIN = 25 # Lowest scheduled speed as a percent from 0% to 100%
 
 SS_SETPOINT = 50 # Safety Stop Setpoint (in cm) between 0cm to 200cm
 LIDAR_ANGLE = 25 # LIDAR window (absolute) in degrees from 0deg to 45deg
+LIDAR_RATE = 60 # Safety stop check rate in Hz (on its own thread, independent of the frame rate)
+
+LIDAR_LOG = None # File path to record LIDAR scans to (e.g. "lfss.rclidar"), None to disable
+TELEMETRY_HOST = None # Laptop IP address to stream telemetry to over UDP, None to disable
+RUN_RECORD = None # File path to record per-frame data to (e.g. "lfss.rcrun"), None to disable
+PROFILE = False # Print per-stage timing (p50/p95/p99) and loop jitter every second, histogram on exit
+HUD = False # Overlay FPS, vision/LIDAR time, detection age and dropped frames on the displayed image
 
 ########################################################################################
 # Global variables
@@ -59,9 +84,74 @@ COLOR_THRESH = ((H_LOW, S_LOW, V_LOW),(H_HIGH, S_HIGH, V_HIGH))
 CROP_FLOOR = ((180, 0), (rc.camera.get_height(), rc.camera.get_width()))
 MIN_CONTOUR_AREA = 30
 
+# Record every scan read through rc.lidar.get_samples() when a log path is given
+if LIDAR_LOG is not None:
+    lidar_log.LidarLogWriter(LIDAR_LOG).attach(rc.lidar)
+
+# Stream per-frame telemetry to telemetry_udp.py running on a laptop
+telemetry = None
+if TELEMETRY_HOST is not None:
+    telemetry = telemetry_udp.TelemetryPublisher(TELEMETRY_HOST)
+
+# Per-frame prints go through a background logger, written at most 10 times per second
+logger = async_log.AsyncLogger(period=0.1)
+
+# Record every frame for offline inspection with run_recorder.load()
+recorder = None
+if RUN_RECORD is not None:
+    recorder = run_recorder.RunRecorder(RUN_RECORD)
+
+# Times each stage of update(); a no-op unless PROFILE or HUD is enabled
+profiler = stage_profiler.StageProfiler(enabled=PROFILE or HUD, dump_on_exit=PROFILE)
+
+# Tracks loop rate, jitter and deadline misses against the designed 60 Hz
+monitor = loop_monitor.LoopMonitor(period=1/60)
+
+# On-screen performance overlay (sprites are rendered once here)
+hud = perf_hud.PerfHud(enabled=HUD)
+detection_age = 0 # Seconds since a contour was last found
+
+# Steering P-controller on the contour column (setpoint 160 px), offset by A_OFFSET
+steering_pid = pid.PID(kp=-(2/160) * A_SENSE/100*2, bias=A_OFFSET) # USER PARAM 7-8
+
+# Pure-pursuit alternative: pixel-to-ground table is built once here
+pursuit = None
+if STEER_MODE == "pursuit":
+    pursuit = pure_pursuit.PurePursuit(rc.camera.get_width(), rc.camera.get_height(),
+                                       crop_top=CROP_FLOOR[0][0], crop_left=CROP_FLOOR[0][1])
+line_contour = None # Largest contour in the floor crop, used by pure pursuit
+
+# Drive commands are only published when they change (plus a keep-alive for the failsafe)
+drive = drive_coalescer.DriveCoalescer(rc.drive)
+
+# Gyro + vision Kalman filter for the column error between (and through missed) frames
+estimator = None
+if IMU_ASSIST:
+    estimator = steering_estimator.SteeringEstimator()
+
+# Curve-dependent speed limit (lookup table is precomputed here)
+scheduler = None
+if SPEED_SCHEDULE:
+    scheduler = speed_scheduler.SpeedScheduler(max_speed=S_VALUE/100, min_speed=S_MIN/100)
+
+# Multi-rate tasks: the LIDAR safety stop runs at LIDAR_RATE on the scheduler's worker
+# thread, vision every frame in update()
+tasks = task_scheduler.TaskScheduler()
+profiler.stage("get_samples") # created here, not from the LIDAR thread
+
+# (speed, distance, time) from the LIDAR thread, replaced in one assignment and read once
+# per frame. A result older than LIDAR_STALE (the thread stopped, or every scan is bad)
+# stops the car
+lidar_result = (0, 0, 0.0)
+LIDAR_STALE = 5 / LIDAR_RATE # s
+
 global speed, angle 
 speed = 0
 angle = 0
+error = 0
+distance = 0
+drive_speed = 0 # speed actually sent to the car (0 while the trigger is released)
+frame_key = None # fingerprint of the newest camera frame, so the estimator fuses each frame once
 
 
 ########################################################################################
@@ -72,8 +162,12 @@ angle = 0
 def update_contour():
     global contour_center
     global contour_area
+    global detection_age
+    global line_contour
+    global frame_key
 
-    image = rc.camera.get_color_image()
+    with profiler.stage("get_color_image"):
+        image = rc.camera.get_color_image()
 
     # Crop the image to the floor directly in front of the car
     image = rc_utils.crop(image, CROP_FLOOR[0], CROP_FLOOR[1])
@@ -82,35 +176,91 @@ def update_contour():
         contour_center = None
         contour_area = 0
     else:
+        # A new frame differs in (at least) sensor noise; a repeated one hashes the same
+        frame_key = hash(image[::8, ::8].tobytes())
+
         # Find all of the contours of the saved color
-        contours = rc_utils.find_contours(image, COLOR_THRESH[0], COLOR_THRESH[1]) # USER PARAM 1-6
+        with profiler.stage("find_contours"):
+            contours = rc_utils.find_contours(image, COLOR_THRESH[0], COLOR_THRESH[1]) # USER PARAM 1-6
 
-        # Select the largest contour
-        contour = rc_utils.get_largest_contour(contours, MIN_CONTOUR_AREA)
+            # Select the largest contour
+            contour = rc_utils.get_largest_contour(contours, MIN_CONTOUR_AREA)
+            line_contour = contour
 
         if contour is not None:
             # Calculate contour information
             contour_center = rc_utils.get_contour_center(contour)
             contour_area = rc_utils.get_contour_area(contour)
+            detection_age = 0
 
             # Draw contour onto the image
-            rc_utils.draw_contour(image, contour)
-            rc_utils.draw_circle(image, contour_center)
+            with profiler.stage("draw"):
+                rc_utils.draw_contour(image, contour)
+                rc_utils.draw_circle(image, contour_center)
 
         else:
             contour_center = None
             contour_area = 0
 
+        # Draw the performance overlay (LIDAR time is from the previous frame)
+        if HUD:
+            detection_age += rc.get_delta_time()
+            hud.draw(image, fps=monitor.rate(), vision_ms=profiler.last_ms("find_contours"),
+                     lidar_ms=profiler.last_ms("get_samples"), detection_age=detection_age,
+                     dropped=monitor.dropped)
+
         # Display the image to the screen
-        rc.display.show_color_image(image)
+        with profiler.stage("show_color_image"):
+            rc.display.show_color_image(image)
+
+# [FUNCTION] LIDAR data retrieval & speed controller, run at LIDAR_RATE on the task thread
+def check_lidar(dt):
+    global lidar_result
+
+    start = time.perf_counter_ns()
+    scan = rc.lidar.get_samples()
+    profiler.add("get_samples", time.perf_counter_ns() - start)
+    if scan is None or len(scan) == 0:
+        return # no fresh result: update() stops the car once the last one is stale
+    window = (360-LIDAR_ANGLE/2, LIDAR_ANGLE/2) # USER PARAM 12
+    loc_angle, new_distance = rc_utils.get_lidar_closest_point(scan, window)
+    dist_error = SS_SETPOINT - new_distance # USER PARAM
+    kp_now = -1/SS_SETPOINT * S_SENSE/100 * 2 # USER PARAM
+
+    # Speed limit: constant S_VALUE, or scheduled from the steering (and pursuit curvature)
+    speed_limit = S_VALUE/100
+    if scheduler is not None:
+        curvature = pursuit.curvature if pursuit is not None else None
+        speed_limit = scheduler.update(angle, dt, curvature)
+
+    # Automatically adjust speed based on error if error > setpoint * 2
+    if dist_error > -SS_SETPOINT:
+        new_speed = kp_now * dist_error
+        new_speed = rc_utils.clamp(new_speed, -speed_limit, speed_limit)
+    else:
+        new_speed = speed_limit
+
+    # Publish both values at once for update()
+    lidar_result = (new_speed, new_distance, time.monotonic())
+
+tasks.add("lidar", check_lidar, rate=LIDAR_RATE, priority=10, threaded=True)
 
 # [FUNCTION] The start function is run once every time the start button is pressed
 def start():
-    global speed, angle
+    global speed, angle, lidar_result, drive_speed
     speed = 0
     angle = 0
+    drive_speed = 0
+    lidar_result = (0, distance, time.monotonic())
+    if scheduler is not None:
+        scheduler.reset()
+    if estimator is not None:
+        estimator.reset()
     # Set initial driving speed and angle
-    rc.drive.set_speed_angle(speed, angle)
+    drive.set_speed_angle(speed, angle, force=True)
+
+    # Start the LIDAR safety stop thread (kept running across restarts)
+    tasks.start()
 
     # Print start message
     print(
@@ -125,46 +275,82 @@ def start():
 # 60 frames per second or slower depending on processing speed) until the back button
 # is pressed  
 def update():
-    global speed, angle
+    global speed, angle, error, distance, drive_speed
+
+    # Record the loop period
+    monitor.tick(rc.get_delta_time())
 
     # Call update contour function
     update_contour()
 
-    # Define a basic p-controller. If contour is not found, keep last angle
-    if contour_center is not None:
-        setpoint = 160
-        error = setpoint - contour_center[1]
-        kp = -(2/setpoint) * A_SENSE/100*2 # USER PARAM 7
-        angle = kp * error + A_OFFSET # USER PARAM 8
-        angle = rc_utils.clamp(angle, -1, 1) # clamp between -1 and 1
-
-    # LIDAR data retrieval & controller
-    scan = rc.lidar.get_samples()
-    window = (360-LIDAR_ANGLE/2, LIDAR_ANGLE/2) # USER PARAM 12
-    loc_angle, distance = rc_utils.get_lidar_closest_point(scan, window)
-    dist_error = SS_SETPOINT - distance # USER PARAM
-    kp_now = -1/SS_SETPOINT * S_SENSE/100 * 2 # USER PARAM
+    setpoint = 160
+
+    # Propagate the line estimate with the gyro, and correct it when a contour is seen
+    if estimator is not None:
+        # Over the last frame the car drove at the previously commanded speed
+        estimator.predict(rc.physics.get_angular_velocity()[1], drive_speed * steering_estimator.MAX_SPEED,
+                          rc.get_delta_time())
+        if contour_center is not None:
+            estimator.correct(setpoint - contour_center[1], frame=frame_key)
+
+    # Define a basic p-controller (or pure pursuit). If contour is not found, keep last angle
+    if pursuit is not None:
+        if contour_center is not None:
+            pursuit_angle = pursuit.steer_to_contour(line_contour, speed)
+            if pursuit_angle is not None:
+                angle = rc_utils.clamp(pursuit_angle + A_OFFSET, -1, 1)
+            error = setpoint - contour_center[1]
+    elif estimator is not None and estimator.initialized:
+        angle = steering_pid.update(setpoint - estimator.error(), setpoint, rc.get_delta_time())
+        error = steering_pid.error
+    elif contour_center is not None:
+        angle = steering_pid.update(contour_center[1], setpoint, rc.get_delta_time()) # clamped to [-1, 1]
+        error = steering_pid.error
+
+    # Newest safety-stop speed from the LIDAR thread (0 if it is stale), then any due
+    # main-thread tasks
+    speed, distance, lidar_time = lidar_result
+    lidar_age = time.monotonic() - lidar_time
+    if lidar_age > LIDAR_STALE:
+        speed = 0
+        logger.log("LIDAR safety stop result is {:.2f}s old, stopping", lidar_age)
+    tasks.run_due()
+
+    # Drive the RACECAR (only while the trigger is held)
+    drive_speed, drive_angle = 0, 0
+    if rc.controller.get_trigger(rc.controller.Trigger.RIGHT) > 0.1:
+        drive_speed, drive_angle = speed, angle
+    with profiler.stage("set_speed_angle"):
+        drive.set_speed_angle(drive_speed, drive_angle)
 
-    # Automatically adjust speed based on error if error > setpoint * 2
-    if dist_error > -SS_SETPOINT:
-        speed = kp_now * dist_error
-        speed = rc_utils.clamp(speed, -S_VALUE/100, S_VALUE/100)
-    else:
-        speed = S_VALUE/100
+    # Send telemetry to the laptop dashboard (never blocks)
+    if telemetry is not None:
+        telemetry.publish(speed, angle, error, contour_center[1] if contour_center is not None else None,
+                          distance, rc.get_delta_time())
 
-    # Drive the RACECAR
-    if rc.controller.get_trigger(rc.controller.Trigger.RIGHT) > 0.1:
-        rc.drive.set_speed_angle(speed, angle)
-    else:
-        rc.drive.set_speed_angle(0, 0)
+    # Record the frame to the run file, with the command actually sent to the car (what
+    # autotune.py identifies the plant from)
+    if recorder is not None:
+        recorder.record(rc.get_delta_time(), drive_speed, drive_angle, error, contour_center, contour_area,
+                        distance, run_recorder.button_mask(rc.controller))
 
     # Print speed and angle
-    print(f"Speed: {speed}, Angle: {angle}")
+    logger.log("Speed: {}, Angle: {}", speed, angle)
+
+# [FUNCTION] update_slow() is similar to update() but is called once per second by
+# default. It is especially useful for printing debug messages, since printing a 
+# message every frame in update is computationally expensive and creates clutter
+def update_slow():
+    if PROFILE:
+        print(profiler.report())
+        print(monitor.report())
+        print(drive.report())
+        print(tasks.report())
 
 ########################################################################################
 # DO NOT MODIFY: Register start and update and begin execution
 ########################################################################################
 
 if __name__ == "__main__":
-    rc.set_start_update(start, update)
+    rc.set_start_update(start, update, update_slow)
     rc.go()
\ No newline at end of file
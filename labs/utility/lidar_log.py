@@ -0,0 +1,326 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: lidar_log.py
+
+Title: Compact LIDAR Log
+
+Purpose: Record LIDAR scans from rc.lidar.get_samples() into a compact binary file and
+read them back with a memory-mapped reader that can seek by timestamp.
+
+Ranges are quantized to uint16 millimeters (0 = no return), optionally delta-encoded
+against the previous scan and compressed with zlib or lz4 in chunks of scans. A 720
+sample scan takes 1440 bytes before compression instead of 5760 bytes as float64.
+
+File layout:
+    header  | magic (8s) version (H) flags (H) codec (H) reserved (H)
+            | samples_per_scan (I) scans_per_chunk (I)
+    chunk*  | n_scans (I) payload_bytes (I) t_first (d) t_last (d)
+            | payload = timestamps (float64 x n_scans) + ranges (uint16 x n_scans x samples)
+
+Usage:
+    log = lidar_log.LidarLogWriter("run.rclidar")
+    log.attach(rc.lidar)  # every rc.lidar.get_samples() call is now recorded
+
+    reader = lidar_log.LidarLogReader("run.rclidar")
+    timestamp, scan_cm = reader.scan_at(12.5)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import atexit
+import mmap
+import struct
+import time
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+########################################################################################
+# Constants
+########################################################################################
+
+MAGIC = b"RCLIDAR1"
+VERSION = 1
+
+FLAG_DELTA = 0x1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZ4 = 2
+CODECS = {None: CODEC_NONE, "none": CODEC_NONE, "zlib": CODEC_ZLIB, "lz4": CODEC_LZ4}
+
+FILE_HEADER = struct.Struct("<8sHHHHII")
+CHUNK_HEADER = struct.Struct("<IIdd")
+
+MM_PER_CM = 10  # rc.lidar.get_samples() reports distances in cm
+MAX_RANGE_MM = np.iinfo(np.uint16).max
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Convert a scan in cm to uint16 mm, writing into out (no allocation)
+def quantize(scan, out, scratch):
+    np.multiply(scan, MM_PER_CM, out=scratch)
+    # NaN is no return (0), +inf is beyond the last representable range
+    np.nan_to_num(scratch, copy=False, nan=0, posinf=MAX_RANGE_MM, neginf=0)
+    np.clip(scratch, 0, MAX_RANGE_MM, out=scratch)
+    np.rint(scratch, out=scratch)
+    out[:] = scratch
+
+
+# [FUNCTION] Convert uint16 mm ranges back to float cm like rc.lidar.get_samples()
+def dequantize(ranges):
+    return ranges.astype(np.float32) / MM_PER_CM
+
+
+def _compress(payload, codec):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(payload, 1)
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(payload)
+    return payload
+
+
+def _decompress(payload, codec):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_LZ4:
+        return lz4_frame.decompress(payload)
+    return payload
+
+########################################################################################
+# Classes
+########################################################################################
+
+class LidarLogWriter:
+    """
+    Appends quantized LIDAR scans to a chunked binary log.
+
+    Scans are buffered in a preallocated chunk and only encoded and written once the
+    chunk is full, so write() costs a quantize and a row copy per scan.
+    """
+
+    def __init__(self, path, samples_per_scan=720, scans_per_chunk=64,
+                 compression="zlib", delta=True, skip_duplicates=True):
+        if compression not in CODECS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {list(CODECS)}")
+        self.codec = CODECS[compression]
+        if self.codec == CODEC_LZ4 and lz4_frame is None:
+            raise ImportError("lz4 compression requested but the lz4 package is not installed")
+
+        self.path = path
+        self.samples_per_scan = samples_per_scan
+        self.scans_per_chunk = scans_per_chunk
+        self.delta = delta
+        self.skip_duplicates = skip_duplicates
+
+        self.timestamps = np.zeros(scans_per_chunk, np.float64)
+        self.ranges = np.zeros((scans_per_chunk, samples_per_scan), np.uint16)
+        self.scratch = np.zeros(samples_per_scan, np.float64)
+        self.last = np.zeros(samples_per_scan, np.uint16)
+        self.count = 0
+        self.scans_written = 0
+        self.bad_scans = 0  # scans of the wrong length, skipped
+        self.has_last = False
+
+        self.file = open(path, "wb")
+        flags = FLAG_DELTA if delta else 0
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, flags, self.codec, 0,
+                                         samples_per_scan, scans_per_chunk))
+        atexit.register(self.close)
+
+    # [FUNCTION] Record one scan (in cm); returns False if it was skipped (duplicate or wrong length)
+    def write(self, scan, timestamp=None):
+        if self.file is None:
+            return False
+        # Never raise here: write() runs inside the lab's get_samples() call (see attach())
+        if len(scan) != self.samples_per_scan:
+            self.bad_scans += 1
+            return False
+
+        row = self.ranges[self.count]
+        quantize(scan, row, self.scratch)
+
+        # The LIDAR publishes slower than update() runs, so most frames repeat a scan
+        if self.skip_duplicates and self.has_last and np.array_equal(row, self.last):
+            return False
+        self.last[:] = row
+        self.has_last = True
+
+        self.timestamps[self.count] = time.monotonic() if timestamp is None else timestamp
+        self.count += 1
+        if self.count == self.scans_per_chunk:
+            self.flush()
+        return True
+
+    # [FUNCTION] Encode and write the buffered scans as one chunk
+    def flush(self):
+        if self.file is None or self.count == 0:
+            return
+        n = self.count
+        ranges = self.ranges[:n]
+        if self.delta:
+            # uint16 arithmetic wraps, so decoding with cumsum in uint16 is lossless
+            encoded = np.empty_like(ranges)
+            encoded[0] = ranges[0]
+            np.subtract(ranges[1:], ranges[:-1], out=encoded[1:])
+        else:
+            encoded = ranges
+        payload = self.timestamps[:n].tobytes() + encoded.tobytes()
+        payload = _compress(payload, self.codec)
+
+        self.file.write(CHUNK_HEADER.pack(n, len(payload), self.timestamps[0], self.timestamps[n - 1]))
+        self.file.write(payload)
+        self.scans_written += n
+        self.count = 0
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+
+    # [FUNCTION] Wrap lidar.get_samples() so that every scan a lab reads is recorded
+    def attach(self, lidar):
+        get_samples = lidar.get_samples
+
+        def get_samples_recorded():
+            scan = get_samples()
+            if scan is not None:
+                self.write(scan)
+            return scan
+
+        lidar.get_samples = get_samples_recorded
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LidarLogReader:
+    """
+    Memory-mapped reader for logs produced by LidarLogWriter.
+
+    Opening the log only walks the chunk headers; chunks are decoded on demand and
+    the most recently decoded chunk is cached, so sequential playback decodes each
+    chunk once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, codec, _, samples, per_chunk = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a LIDAR log")
+        if version != VERSION:
+            raise ValueError(f"Unsupported LIDAR log version {version}")
+        if codec == CODEC_LZ4 and lz4_frame is None:
+            raise ImportError("This log is lz4 compressed but the lz4 package is not installed")
+
+        self.delta = bool(flags & FLAG_DELTA)
+        self.codec = codec
+        self.samples_per_scan = samples
+        self.scans_per_chunk = per_chunk
+
+        offsets, counts, t_first, t_last = [], [], [], []
+        pos = FILE_HEADER.size
+        while pos + CHUNK_HEADER.size <= len(self.map):
+            n, nbytes, t0, t1 = CHUNK_HEADER.unpack_from(self.map, pos)
+            pos += CHUNK_HEADER.size
+            if pos + nbytes > len(self.map):
+                break  # truncated final chunk (recording was killed mid-write)
+            offsets.append((pos, nbytes))
+            counts.append(n)
+            t_first.append(t0)
+            t_last.append(t1)
+            pos += nbytes
+
+        self.chunks = offsets
+        self.chunk_counts = np.array(counts, np.int64)
+        self.chunk_starts = np.concatenate(([0], np.cumsum(self.chunk_counts)))
+        self.chunk_t_first = np.array(t_first, np.float64)
+        self.chunk_t_last = np.array(t_last, np.float64)
+        self.cached_index = -1
+        self.cached = None
+
+    def __len__(self):
+        return int(self.chunk_starts[-1])
+
+    # [FUNCTION] Decode one chunk into (timestamps, ranges_mm)
+    def chunk(self, index):
+        if index == self.cached_index:
+            return self.cached
+        offset, nbytes = self.chunks[index]
+        n = int(self.chunk_counts[index])
+        payload = self.map[offset:offset + nbytes] if self.codec else memoryview(self.map)[offset:offset + nbytes]
+        payload = _decompress(payload, self.codec)
+
+        timestamps = np.frombuffer(payload, np.float64, n)
+        ranges = np.frombuffer(payload, np.uint16, n * self.samples_per_scan, n * 8)
+        ranges = ranges.reshape(n, self.samples_per_scan)
+        if self.delta:
+            ranges = np.cumsum(ranges, axis=0, dtype=np.uint16)
+
+        self.cached_index = index
+        self.cached = (timestamps, ranges)
+        return self.cached
+
+    # [FUNCTION] Return (timestamp, ranges_mm) for the scan at a global index
+    def scan(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("scan index out of range")
+        c = int(np.searchsorted(self.chunk_starts, index, side="right")) - 1
+        timestamps, ranges = self.chunk(c)
+        i = index - int(self.chunk_starts[c])
+        return timestamps[i], ranges[i]
+
+    # [FUNCTION] Index of the latest scan recorded at or before timestamp t
+    def seek(self, t):
+        c = int(np.searchsorted(self.chunk_t_first, t, side="right")) - 1
+        if c < 0:
+            return 0
+        timestamps, _ = self.chunk(c)
+        i = int(np.searchsorted(timestamps, t, side="right")) - 1
+        return int(self.chunk_starts[c]) + max(i, 0)
+
+    # [FUNCTION] Return (timestamp, scan_cm) for the scan at or before timestamp t
+    def scan_at(self, t):
+        timestamp, ranges = self.scan(self.seek(t))
+        return timestamp, dequantize(ranges)
+
+    # [FUNCTION] Iterate over (timestamp, ranges_mm) for every recorded scan
+    def __iter__(self):
+        for c in range(len(self.chunks)):
+            timestamps, ranges = self.chunk(c)
+            for i in range(len(timestamps)):
+                yield timestamps[i], ranges[i]
+
+    def close(self):
+        self.cached = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
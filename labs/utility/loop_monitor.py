@@ -0,0 +1,96 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: loop_monitor.py
+
+Title: Loop Jitter Monitor
+
+Purpose: Check whether update() actually runs at the rate a controller was designed
+for. update() is "ideally" called 60 times per second, but slow vision or display work
+stretches frames, and gains tuned at 60 Hz behave differently at 20 Hz.
+
+tick() records every rc.get_delta_time() into a preallocated window. A frame is a
+deadline miss when it takes longer than period * (1 + tolerance); the number of frames
+that would have run in that time is counted as dropped. The worst stall is kept for
+the whole run. report() summarizes rate, jitter and misses for update_slow().
+
+Usage:
+    monitor = loop_monitor.LoopMonitor(period=1/60)
+    monitor.tick(rc.get_delta_time())   # in update()
+    print(monitor.report())             # in update_slow()
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import numpy as np
+
+########################################################################################
+# Classes
+########################################################################################
+
+class LoopMonitor:
+    """
+    Rolling statistics of the control loop period.
+    """
+
+    def __init__(self, period=1/60, tolerance=0.5, window=600):
+        self.period = period
+        self.deadline = period * (1 + tolerance)
+        self.samples = np.zeros(window, np.float64)
+        self.count = 0
+        self.misses = 0
+        self.dropped = 0
+        self.worst = 0.0
+        self.misses_reported = 0
+
+    # [FUNCTION] Record the time since the last frame, in seconds
+    def tick(self, dt):
+        self.samples[self.count % len(self.samples)] = dt
+        self.count += 1
+        if dt > self.deadline:
+            self.misses += 1
+            self.dropped += int(dt / self.period) - 1
+        if dt > self.worst:
+            self.worst = dt
+
+    def window(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    # [FUNCTION] Mean loop rate over the current window, in Hz
+    def rate(self):
+        dts = self.window()
+        mean = dts.mean() if len(dts) else 0.0
+        return 1 / mean if mean > 0 else 0.0
+
+    # [FUNCTION] Dict of the current window's statistics (times in milliseconds)
+    def stats(self):
+        dts = self.window()
+        if len(dts) == 0:
+            return None
+        ms = dts * 1000
+        return {
+            "rate_hz": self.rate(),
+            "mean_ms": ms.mean(),
+            "jitter_ms": ms.std(),
+            "p99_ms": np.percentile(ms, 99),
+            "max_ms": ms.max(),
+            "worst_ms": self.worst * 1000,
+            "misses": self.misses,
+            "dropped": self.dropped,
+        }
+
+    # [FUNCTION] One-line summary; includes how many deadlines were missed since the last report
+    def report(self):
+        s = self.stats()
+        if s is None:
+            return "Loop: no frames yet"
+        new_misses = self.misses - self.misses_reported
+        self.misses_reported = self.misses
+        return (f"Loop: {s['rate_hz']:5.1f} Hz (target {1 / self.period:.0f}) || "
+                f"dt mean {s['mean_ms']:.1f}ms, jitter {s['jitter_ms']:.1f}ms, "
+                f"p99 {s['p99_ms']:.1f}ms, worst {s['worst_ms']:.1f}ms || "
+                f"Deadline misses: {new_misses} new, {s['misses']} total, {s['dropped']} frames dropped")
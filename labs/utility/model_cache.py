@@ -0,0 +1,150 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: model_cache.py
+
+Title: Cached, Pre-Warmed Detection Backends
+
+Purpose: Load the object detection model once per process instead of on every press of
+the start button. Creating a backend loads the .tflite file, allocates tensors and reads
+the labels, which takes seconds, and the first invoke() after that is slow too (EdgeTPU
+model upload, CPU kernel setup).
+
+get() creates a backend (see inference_backend.make_backend()) the first time it is
+asked for a (name, model path, label path, options) key, runs one warm-up inference on
+an all-zero input, and returns the same backend for that key for the rest of the
+process. preload() does the same on a background thread, e.g. at import time of a lab,
+so the model is loading while the car is being set up; a later get() for the same key
+waits for that load to finish (or raises its error) instead of loading again.
+
+Cached backends are shared, so only one thread at a time may use each one (for example,
+stop the old InferencePipeline before starting a new one on the same backend).
+
+Usage:
+    model_cache.preload("edgetpu", model_path, label_path)   # at import, returns at once
+    backend = model_cache.get("edgetpu", model_path, label_path)   # in start()
+    print(model_cache.report())
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import threading
+import time
+
+import numpy as np
+
+import inference_backend
+
+########################################################################################
+# Global variables
+########################################################################################
+
+_models = {}  # key -> CachedModel, for the lifetime of the process
+_lock = threading.Lock()
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Run one inference on an all-zero input so the first real frame is not slow
+def warm_up(backend):
+    width, height = backend.input_size
+    backend.set_input(np.zeros((height, width, 3), np.uint8))
+    backend.invoke()  # outputs of a blank frame are never decoded, so no backend state depends on them
+
+
+# [FUNCTION] Cache entry for a key, and whether the caller created it (and must load it)
+def _entry(name, model_path, label_path, options):
+    key = (name, model_path, label_path, tuple(sorted(options.items())))
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model, False
+        model = _models[key] = CachedModel(key)
+        return model, True
+
+
+# [FUNCTION] Start loading a backend on a background thread; returns immediately
+def preload(name, model_path=None, label_path=None, warmup=True, **options):
+    model, created = _entry(name, model_path, label_path, options)
+    if created:
+        threading.Thread(target=model.load, args=(warmup,), name="model_cache",
+                         daemon=True).start()
+    return model
+
+
+# [FUNCTION] Cached (loaded and warmed-up) backend, loading or waiting for a preload if needed
+def get(name, model_path=None, label_path=None, warmup=True, **options):
+    model, created = _entry(name, model_path, label_path, options)
+    if created:
+        model.load(warmup)
+    model.ready.wait()
+    if model.error is not None:
+        # Forget the failed load so a later get() (e.g. after copying the model) retries
+        with _lock:
+            if _models.get(model.key) is model:
+                del _models[model.key]
+        raise model.error
+    return model.backend
+
+
+# [FUNCTION] Drop every cached backend (the next get() loads again)
+def clear():
+    with _lock:
+        _models.clear()
+
+
+# [FUNCTION] One line per cached backend with its load and warm-up times
+def report():
+    with _lock:
+        models = list(_models.values())
+    lines = []
+    for model in models:
+        name, model_path, _, _ = model.key
+        if not model.ready.is_set():
+            state = "loading"
+        elif model.error is not None:
+            state = f"failed ({model.error})"
+        else:
+            state = f"load {model.load_time:.2f}s, warm-up {1000 * model.warmup_time:.1f}ms"
+        path = f" {model_path}" if model_path else ""
+        lines.append(f"{name}{path}: {state}")
+    return "\n".join(lines)
+
+########################################################################################
+# Classes
+########################################################################################
+
+class CachedModel:
+    """
+    A backend that is loading or loaded, with its load and warm-up times.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ready = threading.Event()
+        self.backend = None
+        self.error = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+    # [FUNCTION] Create and warm up the backend, recording any error for get()
+    def load(self, warmup=True):
+        name, model_path, label_path, options = self.key
+        try:
+            start = time.perf_counter()
+            backend = inference_backend.make_backend(name, model_path, label_path, **dict(options))
+            self.load_time = time.perf_counter() - start
+            if warmup:
+                start = time.perf_counter()
+                warm_up(backend)
+                self.warmup_time = time.perf_counter() - start
+            self.backend = backend
+        except Exception as error:
+            self.error = error
+        finally:
+            self.ready.set()
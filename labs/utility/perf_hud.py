@@ -0,0 +1,118 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: perf_hud.py
+
+Title: Performance HUD
+
+Purpose: Draw loop FPS, vision/LIDAR stage times, detection age and dropped frames onto
+the image passed to rc.display.show_color_image(), so slowdowns are visible at the
+track without a laptop.
+
+Glyphs are rendered with cv2.putText once, when the HUD is created: one sprite per
+label and one fixed-width sprite per character that can appear in a value. A line is
+recomposed from those sprites only when its text changes, and drawing a frame copies
+one small sprite per line into the corner of the (already cropped or downscaled)
+display image, so the overlay never re-renders text.
+
+Usage:
+    hud = perf_hud.PerfHud()
+    hud.draw(image, fps=monitor.rate(), vision_ms=profiler.last_ms("find_contours"))
+    rc.display.show_color_image(image)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import cv2
+import numpy as np
+
+########################################################################################
+# Constants
+########################################################################################
+
+# (keyword, label, format) of every line the HUD can show, top to bottom
+DEFAULT_FIELDS = (
+    ("fps", "FPS", "{:5.1f}"),
+    ("vision_ms", "VIS ms", "{:5.1f}"),
+    ("lidar_ms", "LID ms", "{:5.1f}"),
+    ("detection_age", "DET s", "{:5.2f}"),
+    ("dropped", "DROP", "{:5d}"),
+)
+
+CHARSET = "0123456789.-+: naif"  # digits plus what "nan"/"inf" need
+
+########################################################################################
+# Classes
+########################################################################################
+
+class PerfHud:
+    """
+    Opt-in performance overlay built from cached text sprites.
+    """
+
+    def __init__(self, fields=DEFAULT_FIELDS, origin=(4, 4), scale=0.4,
+                 color=(0, 255, 0), background=(0, 0, 0), enabled=True):
+        self.fields = tuple(fields)
+        self.origin = origin
+        self.enabled = enabled
+
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (_, text_h), baseline = cv2.getTextSize("0", font, scale, 1)
+        self.line_h = text_h + baseline + 2
+        self.char_w = max(cv2.getTextSize(c, font, scale, 1)[0][0] for c in CHARSET) + 1
+
+        def render(text, width):
+            sprite = np.empty((self.line_h, width, 3), np.uint8)
+            sprite[:] = background
+            cv2.putText(sprite, text, (0, text_h + 1), font, scale, color, 1, cv2.LINE_AA)
+            return sprite
+
+        # Every label is padded to the widest one so values line up in a column
+        self.label_w = max(cv2.getTextSize(label, font, scale, 1)[0][0] for _, label, _ in self.fields) + 6
+        self.labels = {key: render(label, self.label_w) for key, label, _ in self.fields}
+        self.glyphs = {c: render(c, self.char_w) for c in CHARSET}
+        self.unknown = render("?", self.char_w)
+
+        # Composed label + value sprite of each line, rebuilt only when its text changes
+        self.lines = {}
+        self.line_text = {}
+
+    # [FUNCTION] Copy one pre-rendered sprite into the image, clipped to its borders
+    def _blit(self, image, sprite, x, y):
+        h = min(sprite.shape[0], image.shape[0] - y)
+        w = min(sprite.shape[1], image.shape[1] - x)
+        if h > 0 and w > 0:
+            image[y:y + h, x:x + w] = sprite[:h, :w]
+
+    # [FUNCTION] Line sprite for a field, recomposed from glyph sprites only if the text changed
+    def _line(self, key, text):
+        if self.line_text.get(key) == text:
+            return self.lines[key]
+        line = self.lines.get(key)
+        width = self.label_w + len(text) * self.char_w
+        if line is None or line.shape[1] != width:
+            line = self.lines[key] = np.empty((self.line_h, width, 3), np.uint8)
+            line[:, :self.label_w] = self.labels[key]
+        x = self.label_w
+        for c in text:
+            line[:, x:x + self.char_w] = self.glyphs.get(c, self.unknown)
+            x += self.char_w
+        self.line_text[key] = text
+        return line
+
+    # [FUNCTION] Draw the given values (keywords from the field list) onto a BGR image
+    def draw(self, image, **values):
+        if not self.enabled or image is None:
+            return image
+        x, y = self.origin
+        for key, _, fmt in self.fields:
+            value = values.get(key)
+            if value is None:
+                continue
+            self._blit(image, self._line(key, fmt.format(value)), x, y)
+            y += self.line_h
+        return image
@@ -0,0 +1,116 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: pid.py
+
+Title: PID Controller
+
+Purpose: One PID implementation for the labs that is safe to run on a real car loop,
+where frames can arrive back-to-back or stall:
+- dt comes from the caller (e.g. rc.get_delta_time()) or from time.monotonic(), and a
+  zero, negative or very long dt never divides by zero or integrates a stall
+- the derivative is taken on the measurement (no kick when the setpoint changes) and
+  low-pass filtered, since pixel errors are noisy
+- the integral is clamped and frozen while the output is saturated (anti-windup)
+- the output can be rate limited and clamped
+
+update() only does float arithmetic on attributes, so it allocates nothing per step
+beyond Python floats.
+
+Usage:
+    steering = pid.PID(kp=-0.0125, kd=-0.001, derivative_tau=0.05)
+    angle = steering.update(contour_center[1], setpoint=160, dt=rc.get_delta_time())
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import time
+
+########################################################################################
+# Classes
+########################################################################################
+
+class PID:
+    """
+    PID controller with filtered derivative on measurement, integral clamping and
+    output rate limiting. Output = kp*e + ki*integral(e) - kd*d(measurement)/dt + bias,
+    where e = setpoint - measurement.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, bias=0.0, output_limits=(-1.0, 1.0),
+                 integral_limit=None, derivative_tau=0.0, rate_limit=None, max_dt=0.5,
+                 clock=time.monotonic):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.bias = bias
+        self.output_limits = output_limits  # (low, high) or None
+        self.integral_limit = integral_limit  # bound on |ki * integral|, None = output limits only
+        self.derivative_tau = derivative_tau  # seconds, 0 = unfiltered
+        self.rate_limit = rate_limit  # max output change per second, None = unlimited
+        self.max_dt = max_dt  # longer gaps are treated as a restart, not integrated
+        self.clock = clock
+        self.reset()
+
+    # [FUNCTION] Forget integral, derivative and timing history
+    def reset(self):
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.prev_measurement = None
+        self.last_time = None
+        self.output = None
+        self.error = 0.0
+
+    # [FUNCTION] Compute the next output; dt=None measures time since the last update
+    def update(self, measurement, setpoint=0.0, dt=None):
+        if dt is None:
+            now = self.clock()
+            dt = 0.0 if self.last_time is None else now - self.last_time
+            self.last_time = now
+
+        error = setpoint - measurement
+        self.error = error
+        valid_dt = 0.0 < dt <= self.max_dt
+
+        # Filtered derivative on measurement; skipped for back-to-back or stalled frames
+        if valid_dt and self.prev_measurement is not None:
+            raw = -(measurement - self.prev_measurement) / dt
+            if self.derivative_tau > 0:
+                self.derivative += (raw - self.derivative) * dt / (self.derivative_tau + dt)
+            else:
+                self.derivative = raw
+        elif not valid_dt and dt > self.max_dt:
+            self.derivative = 0.0
+        self.prev_measurement = measurement
+
+        unclamped = self.kp * error + self.ki * self.integral + self.kd * self.derivative + self.bias
+        output = self._clamp(unclamped)
+
+        # Integrate only when it would not push a saturated output further (anti-windup)
+        if valid_dt and self.ki != 0:
+            pushing_out = (unclamped != output) and ((self.ki * error > 0) == (unclamped > output))
+            if not pushing_out:
+                self.integral += error * dt
+                if self.integral_limit is not None:
+                    bound = abs(self.integral_limit / self.ki)
+                    self.integral = max(-bound, min(bound, self.integral))
+                output = self._clamp(self.kp * error + self.ki * self.integral
+                                     + self.kd * self.derivative + self.bias)
+
+        # Slew-rate limit relative to the previous output
+        if self.rate_limit is not None and self.output is not None and dt >= 0:
+            step = self.rate_limit * dt
+            output = max(self.output - step, min(self.output + step, output))
+
+        self.output = output
+        return output
+
+    def _clamp(self, value):
+        if self.output_limits is None:
+            return value
+        low, high = self.output_limits
+        return max(low, min(high, value))
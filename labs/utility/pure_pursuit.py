@@ -0,0 +1,145 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: pure_pursuit.py
+
+Title: Pure-Pursuit Steering
+
+Purpose: Geometric steering for the line followers. A P-controller on the pixel column
+of the contour center reacts the same way to a line 30 cm ahead and 1 m ahead, and its
+gain has to be retuned whenever the speed changes.
+
+Pure pursuit instead picks a look-ahead point on the line, in metres in the car frame,
+and steers onto the circular arc through it:
+
+    curvature = 2 * left / distance^2,    wheel angle = atan(WHEELBASE * curvature)
+
+Pixels are mapped to the ground with a flat-floor pinhole model of the camera. The
+(forward, left) position of every pixel is computed once per camera geometry and cached,
+so per frame only the contour points are looked up. The look-ahead distance grows with
+speed (min_lookahead + lookahead_gain * v), which keeps the steering calm at speed and
+tight at low speed. It is clamped to the range of floor straight ahead that the cropped
+image actually shows, so the target is always a seen point of the line and never
+extrapolated past the crop. For the lfss.py floor crop (rows 180-480 of the 640x480
+image) that range is about 0.22 - 0.95 m, and the look-ahead goes from 0.30 m at
+standstill to 0.95 m at full speed.
+
+The camera constants below are estimates for the RACECAR Neo; measure the camera height
+and pitch on your car if the car cuts or overshoots corners.
+
+Usage:
+    pursuit = pure_pursuit.PurePursuit(rc.camera.get_width(), rc.camera.get_height(),
+                                       crop_top=CROP_FLOOR[0][0])
+    angle = pursuit.steer_to_contour(contour, speed)   # None if the line is out of view
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import functools
+import math
+
+import numpy as np
+
+from vehicle import MAX_SPEED, MAX_STEER, WHEELBASE
+
+########################################################################################
+# Constants (camera model)
+########################################################################################
+
+CAMERA_HEIGHT = 0.16  # m, lens above the floor
+CAMERA_PITCH = math.radians(15)  # downward tilt of the optical axis
+CAMERA_HFOV = math.radians(69)  # horizontal field of view
+CAMERA_VFOV = math.radians(42)  # vertical field of view
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Ground position (forward, left) in metres of every pixel; NaN above the horizon
+@functools.lru_cache(maxsize=4)
+def ground_table(width, height, camera_height=CAMERA_HEIGHT, pitch=CAMERA_PITCH,
+                 hfov=CAMERA_HFOV, vfov=CAMERA_VFOV):
+    fx = (width / 2) / math.tan(hfov / 2)
+    fy = (height / 2) / math.tan(vfov / 2)
+    right = (np.arange(width) + 0.5 - width / 2) / fx  # ray slope per column
+    down = (np.arange(height) + 0.5 - height / 2) / fy  # ray slope per row
+
+    # Ray = optical axis + down * (down axis) + right * (right axis), camera pitched down
+    drop = math.sin(pitch) + down * math.cos(pitch)  # downward component per row
+    ahead = math.cos(pitch) - down * math.sin(pitch)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(drop > 1e-6, camera_height / drop, np.nan)
+    forward = np.repeat((scale * ahead)[:, None], width, axis=1).astype(np.float32)
+    left = (-scale[:, None] * right[None, :]).astype(np.float32)
+    forward.setflags(write=False)
+    left.setflags(write=False)
+    return forward, left
+
+########################################################################################
+# Classes
+########################################################################################
+
+class PurePursuit:
+    """
+    Pure-pursuit steering on a camera contour with a speed-dependent look-ahead.
+    """
+
+    def __init__(self, width, height, crop_top=0, crop_left=0, min_lookahead=0.3,
+                 max_lookahead=1.0, lookahead_gain=0.4, band=0.05, **camera):
+        self.forward, self.left = ground_table(width, height, **camera)
+        self.crop_top = crop_top  # contours are found in the floor crop, not the full image
+        self.crop_left = crop_left
+
+        # Nearest and farthest floor straight ahead inside the crop (centre column)
+        ahead = self.forward[crop_top:, (crop_left + width) // 2]
+        self.visible = (float(np.nanmin(ahead)), float(np.nanmax(ahead)))
+
+        self.min_lookahead = min_lookahead  # m at standstill
+        self.max_lookahead = max_lookahead  # m
+        self.lookahead_gain = lookahead_gain  # extra metres per m/s
+        self.band = band  # m, contour points this close to the best range are averaged
+        self.target = None  # last (forward, left) look-ahead point, for drawing/logging
+        self.curvature = 0.0  # 1/m of the last arc, positive = bends left
+
+    # [FUNCTION] Look-ahead distance (m) for an rc.drive speed in [-1, 1], within the visible floor
+    def lookahead(self, speed):
+        distance = self.min_lookahead + self.lookahead_gain * abs(speed) * MAX_SPEED
+        near, far = self.visible
+        return max(near, min(self.max_lookahead, far, distance))
+
+    # [FUNCTION] Look-ahead point (forward, left) on an OpenCV contour, None if not on the floor
+    def find_target(self, contour, distance):
+        points = contour.reshape(-1, 2)
+        rows = np.clip(points[:, 1] + self.crop_top, 0, self.forward.shape[0] - 1)
+        cols = np.clip(points[:, 0] + self.crop_left, 0, self.forward.shape[1] - 1)
+        forward = self.forward[rows, cols]
+        left = self.left[rows, cols]
+
+        visible = ~np.isnan(forward)
+        if not visible.any():
+            return None
+        forward, left = forward[visible], left[visible]
+
+        # Both edges of the tape cross the look-ahead range: average them
+        miss = np.abs(np.hypot(forward, left) - distance)
+        near = miss <= miss.min() + self.band
+        return float(forward[near].mean()), float(left[near].mean())
+
+    # [FUNCTION] rc.drive angle in [-1, 1] that drives the arc through a (forward, left) point
+    def steer(self, target):
+        forward, left = target
+        curvature = 2 * left / max(forward * forward + left * left, 1e-6)
+        self.curvature = curvature
+        wheel_angle = math.atan(WHEELBASE * curvature)
+        return max(-1.0, min(1.0, -wheel_angle / MAX_STEER))  # positive angle steers right
+
+    # [FUNCTION] Steering angle for a line contour at the current speed, None if no target
+    def steer_to_contour(self, contour, speed):
+        self.target = self.find_target(contour, self.lookahead(speed))
+        if self.target is None:
+            return None
+        return self.steer(self.target)
@@ -0,0 +1,108 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: ring_buffer.py
+
+Title: Telemetry Ring Buffer
+
+Purpose: Fixed-length, multi-channel history of telemetry values (line position, error,
+commanded angle, ...) for the live plots in the tuner scripts.
+
+append() is O(1) and never allocates: each sample is written twice, at head and at
+head + length, so the most recent `length` samples of every channel always form one
+contiguous slice. snapshot() copies that slice out under a sequence counter (a
+seqlock), so a plotting thread or process never sees a half-written frame.
+
+Snapshots are ordered newest first, matching the old insert(0, ...) list histories.
+
+Usage:
+    history = ring_buffer.RingBuffer(("error", "cmd"), 300)
+    history.append(error, angle)          # in update()
+    frame = history.snapshot()            # in the plotting thread
+    line.set_ydata(frame["error"])
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import numpy as np
+
+########################################################################################
+# Classes
+########################################################################################
+
+class RingBuffer:
+    """
+    Preallocated history of named float64 channels.
+
+    The storage can be supplied through `buffer` (any writable buffer of at least
+    RingBuffer.nbytes(len(channels), length) bytes) so the same history can live in
+    shared memory and be read from another process.
+    """
+
+    HEADER_BYTES = 16  # int64 sequence counter + int64 head index
+
+    def __init__(self, channels, length, buffer=None):
+        self.channels = tuple(channels)
+        self.length = int(length)
+        self.rows = {name: i for i, name in enumerate(self.channels)}
+        if buffer is None:
+            buffer = bytearray(self.nbytes(len(self.channels), self.length))
+
+        # header[0] is odd while a write is in progress, header[1] is the next write slot
+        self.header = np.ndarray((2,), np.int64, buffer, 0)
+        self.data = np.ndarray((len(self.channels), 2 * self.length), np.float64,
+                               buffer, self.HEADER_BYTES)
+
+    # [FUNCTION] Bytes of storage needed for a buffer with this shape
+    @classmethod
+    def nbytes(cls, n_channels, length):
+        return cls.HEADER_BYTES + n_channels * 2 * length * np.dtype(np.float64).itemsize
+
+    # [FUNCTION] Record one sample per channel, in the order the channels were declared
+    def append(self, *values):
+        header = self.header
+        head = int(header[1])
+        header[0] += 1
+        self.data[:, head] = values
+        self.data[:, head + self.length] = values
+        header[1] = (head + 1) % self.length
+        header[0] += 1
+
+    # [FUNCTION] Zero every channel (e.g. when start() is pressed again)
+    def clear(self):
+        self.header[0] += 1
+        self.data[:] = 0
+        self.header[1] = 0
+        self.header[0] += 1
+
+    # [FUNCTION] Consistent copy of all channels, newest sample first
+    def snapshot(self, retries=100):
+        frame = None
+        for _ in range(retries):
+            seq = int(self.header[0])
+            if seq & 1:
+                continue
+            head = int(self.header[1])
+            frame = self.data[:, head:head + self.length][:, ::-1].copy()
+            if int(self.header[0]) == seq:
+                break
+        if frame is None:
+            # Writer never went quiet; a slightly torn frame beats no frame for a plot
+            head = int(self.header[1])
+            frame = self.data[:, head:head + self.length][:, ::-1].copy()
+        return {name: frame[i] for name, i in self.rows.items()}
+
+    # [FUNCTION] Copy of a single channel, newest sample first
+    def __getitem__(self, name):
+        return self.snapshot()[name]
+
+    # [FUNCTION] Most recent sample of a single channel
+    def latest(self, name):
+        return float(self.data[self.rows[name], int(self.header[1]) - 1 + self.length])
+
+    def __len__(self):
+        return self.length
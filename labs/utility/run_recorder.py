@@ -0,0 +1,178 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: run_recorder.py
+
+Title: Run Recorder
+
+Purpose: Record one fixed-width record per frame (timestamp, dt, speed, angle, error,
+contour center/area, LIDAR distance, controller buttons) into a memory-mapped columnar
+file, so a run that went wrong can be inspected afterwards with NumPy or pandas.
+
+The file is a 64 byte header followed by chunks of CHUNK_FRAMES frames. Inside a chunk
+each field is stored as one contiguous column, which makes the whole body a NumPy
+structured array of chunks that can be memory mapped directly. The file grows one
+chunk at a time, and record() is a handful of stores into the mapping.
+
+Usage (car):
+    recorder = run_recorder.RunRecorder("lfss_run.rcrun")
+    recorder.record(rc.get_delta_time(), speed, angle, error, contour_center, contour_area,
+                    distance, run_recorder.button_mask(rc.controller))
+
+Usage (laptop):
+    run = run_recorder.load("lfss_run.rcrun")       # dict of NumPy columns
+    df = pandas.DataFrame(run)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import atexit
+import struct
+import time
+
+import numpy as np
+
+########################################################################################
+# Constants
+########################################################################################
+
+MAGIC = b"RCRUN001"
+HEADER = struct.Struct("<8sIIQ")  # magic, record size, frames per chunk, frames written
+HEADER_SIZE = 64
+
+CHUNK_FRAMES = 4096
+
+FIELDS = (
+    ("timestamp", "<f8"),
+    ("dt", "<f4"),
+    ("speed", "<f4"),
+    ("angle", "<f4"),
+    ("error", "<f4"),
+    ("contour_row", "<f4"),
+    ("contour_col", "<f4"),
+    ("contour_area", "<f4"),
+    ("lidar_distance", "<f4"),
+    ("buttons", "<u4"),
+)
+RECORD_DTYPE = np.dtype(list(FIELDS))
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Structured dtype of one chunk: every field as a column of chunk_frames values
+def chunk_dtype(chunk_frames):
+    return np.dtype([(name, kind, (chunk_frames,)) for name, kind in FIELDS])
+
+
+# [FUNCTION] Bitmask of controller buttons currently held (bit i = i-th Button member)
+def button_mask(controller):
+    mask = 0
+    for i, button in enumerate(controller.Button):
+        if controller.is_down(button):
+            mask |= 1 << i
+    return mask
+
+
+# [FUNCTION] Read a recorded run as a dict of NumPy columns (no parsing, one copy per column)
+def load(path):
+    with open(path, "rb") as f:
+        magic, record_size, chunk_frames, frames = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a run recording")
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} was recorded with a different field layout")
+
+    chunks = np.memmap(path, dtype=chunk_dtype(chunk_frames), mode="r", offset=HEADER_SIZE)
+    return {name: chunks[name].reshape(-1)[:frames] for name, _ in FIELDS}
+
+########################################################################################
+# Classes
+########################################################################################
+
+class RunRecorder:
+    """
+    Appends per-frame records to a preallocated, memory-mapped columnar file.
+    """
+
+    def __init__(self, path, chunk_frames=CHUNK_FRAMES):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.dtype = chunk_dtype(chunk_frames)
+        self.frames = 0
+        self.capacity = 0
+        self.chunks = None
+        self.columns = None
+        self.last_chunk = -1
+
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, chunk_frames, 0).ljust(HEADER_SIZE, b"\0"))
+        self.header = np.memmap(path, dtype=np.uint64, mode="r+", offset=HEADER.size - 8, shape=(1,))
+        self.grow()
+        atexit.register(self.close)
+
+    # [FUNCTION] Extend the file by one chunk and remap it
+    def grow(self):
+        n_chunks = self.capacity // self.chunk_frames + 1
+        if self.chunks is not None:
+            self.chunks.flush()
+        self.chunks = None
+        self.columns = None
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + n_chunks * self.dtype.itemsize)
+        self.chunks = np.memmap(self.path, dtype=self.dtype, mode="r+", offset=HEADER_SIZE,
+                                shape=(n_chunks,))
+        self.capacity = n_chunks * self.chunk_frames
+        self.last_chunk = -1
+
+    # [FUNCTION] Append one frame; contour_center is (row, col) or None
+    def record(self, dt, speed, angle, error, contour_center, contour_area,
+               lidar_distance, buttons=0, timestamp=None):
+        if self.chunks is None:
+            return
+        if self.frames == self.capacity:
+            self.grow()
+
+        chunk, i = divmod(self.frames, self.chunk_frames)
+        if chunk != self.last_chunk:
+            # Cache the column views of the current chunk so a record is plain stores
+            self.columns = [self.chunks[name][chunk] for name, _ in FIELDS]
+            self.last_chunk = chunk
+
+        if contour_center is None:
+            row = col = np.nan
+        else:
+            row, col = contour_center
+        c = self.columns
+        c[0][i] = time.monotonic() if timestamp is None else timestamp
+        c[1][i] = dt
+        c[2][i] = speed
+        c[3][i] = angle
+        c[4][i] = error
+        c[5][i] = row
+        c[6][i] = col
+        c[7][i] = contour_area
+        c[8][i] = lidar_distance
+        c[9][i] = buttons
+
+        self.frames += 1
+        self.header[0] = self.frames
+
+    def close(self):
+        if self.chunks is None:
+            return
+        self.chunks.flush()
+        self.header.flush()
+        self.chunks = None
+        self.columns = None
+        self.header = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
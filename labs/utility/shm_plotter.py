@@ -0,0 +1,184 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: shm_plotter.py
+
+Title: Shared Memory Live Plotter
+
+Purpose: Run the matplotlib live plots of the tuner scripts in a separate process so
+they no longer compete with update() for the GIL.
+
+The telemetry history is a RingBuffer whose storage lives in a shared memory block.
+update() keeps calling append() (a handful of stores per frame) and the plot process
+attaches to the same block by name and reads tear-free snapshots at its own pace, still
+blitting.
+
+The plot process is a fresh Python interpreter running this file, not a fork: by the
+time start() runs, the script already has ROS threads (and on a restart a Tk thread),
+and forking a multi-threaded process can deadlock the child. multiprocessing's "spawn"
+would re-run the whole lab script in the child (creating a second racecar), so the plot
+is described with plain data (title, axis labels and limits, one entry per line) and
+passed on the command line instead of as a function.
+
+Usage:
+    loc_history = shm_plotter.SharedRingBuffer(("loc",), 300)
+
+    plot_process = shm_plotter.start_plot_process(      # in start()
+        loc_history, title="Line Position vs. Frame #", ylabel="Pixels (px)", ylim=(0, 320),
+        lines=[{"channel": "loc", "label": "Line Position"}], setpoint=160)
+    shm_plotter.stop_plot_process(plot_process)          # before starting another
+
+The plot process is terminated when the script exits, before the shared memory is
+unlinked.
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import atexit
+import json
+import os
+import subprocess
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+from ring_buffer import RingBuffer
+
+########################################################################################
+# Classes
+########################################################################################
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer backed by a multiprocessing.shared_memory block.
+
+    The creating process unlinks the block when it exits; plot processes attach to it
+    by name (attach=True) and only close their mapping.
+    """
+
+    def __init__(self, channels, length, name=None):
+        channels = tuple(channels)
+        size = RingBuffer.nbytes(len(channels), length)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Attaching registers the block with this process's resource tracker, which
+            # would unlink it when the plot closes; only the creator may unlink it
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        super().__init__(channels, length, self.shm.buf)
+        atexit.register(self.close)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # [FUNCTION] Release the shared memory block (and unlink it in the creating process)
+    def close(self):
+        if self.shm is None:
+            return
+        # The NumPy views must go before the mapping can be closed
+        self.header = None
+        self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Plot channels of a SharedRingBuffer live in a new Python process (stopped at exit)
+def start_plot_process(buffer, title="", xlabel="Frame Number", ylabel="", ylim=None,
+                       lines=(), setpoint=None, setpoint_label="Setpoint", twin=None):
+    # lines: [{"channel", "label", and optional matplotlib "color" / "linestyle"}]
+    # setpoint: constant y value or channel name of a dashed reference line, None for none
+    # twin: {"ylabel", "ylim", "lines"} for channels on a second y axis
+    spec = {"shm": buffer.name, "channels": list(buffer.channels), "length": buffer.length,
+            "title": title, "xlabel": xlabel, "ylabel": ylabel, "ylim": ylim,
+            "lines": list(lines), "setpoint": setpoint, "setpoint_label": setpoint_label,
+            "twin": twin}
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), json.dumps(spec)])
+    atexit.register(stop_plot_process, process)
+    return process
+
+
+# [FUNCTION] Terminate and wait for a plot process (None or already stopped is fine)
+def stop_plot_process(process, timeout=1.0):
+    if process is None:
+        return
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+# [FUNCTION] Body of the plot process: attach to the buffer and animate the spec
+def run_plot(spec):
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+
+    history = SharedRingBuffer(spec["channels"], spec["length"], name=spec["shm"])
+    x = range(history.length)
+    frame = history.snapshot()
+
+    fig, ax = plt.subplots()
+    axes = [(ax, spec["lines"])]
+    if spec["twin"]:
+        ax2 = ax.twinx()
+        ax2.set_ylabel(spec["twin"].get("ylabel", ""))
+        if spec["twin"].get("ylim"):
+            ax2.set_ylim(*spec["twin"]["ylim"])
+        axes.append((ax2, spec["twin"]["lines"]))
+
+    artists = []  # (line, channel)
+    for axis, lines in axes:
+        for line in lines:
+            style = {key: line[key] for key in ("color", "linestyle") if key in line}
+            artist, = axis.plot(x, frame[line["channel"]], label=line["label"], **style)
+            artists.append((artist, line["channel"]))
+
+    setpoint = spec["setpoint"]
+    setpoint_line = None
+    if setpoint is not None:
+        value = history.latest(setpoint) if isinstance(setpoint, str) else setpoint
+        setpoint_line = ax.axhline(y=value, color='red', linestyle='--', label=spec["setpoint_label"])
+
+    # Set title, labels and limits
+    ax.set_title(spec["title"])
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    if spec["ylim"]:
+        ax.set_ylim(*spec["ylim"])
+    ax.set_xlim(0, history.length - 1)
+
+    # One legend for both axes
+    handles = [artist for artist, _ in artists]
+    if setpoint_line is not None:
+        handles.append(setpoint_line)
+    ax.legend(handles, [handle.get_label() for handle in handles], loc="upper right")
+
+    def update_plot(i):
+        frame = history.snapshot()  # one consistent copy of every channel
+        for artist, channel in artists:
+            artist.set_ydata(frame[channel])
+        if isinstance(setpoint, str):
+            value = history.latest(setpoint)
+            setpoint_line.set_ydata([value, value])
+        return handles
+
+    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
+    plt.show()
+
+
+if __name__ == "__main__":
+    run_plot(json.loads(sys.argv[1]))
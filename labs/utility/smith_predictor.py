@@ -0,0 +1,95 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: smith_predictor.py
+
+Title: Smith Predictor
+
+Purpose: Delay-compensating line-following controller to compare against in
+lagmachine.py. A plain P-controller acting on an error that is LAGTIME seconds old
+keeps correcting for something it already fixed, and oscillates at high speed.
+
+The predictor runs an internal model of the plant from steering command to line
+error: a first-order steering actuator (time constant tau) followed by an integrator,
+since the line drifts across the image at a rate proportional to the steering angle
+(plant_gain, in pixels per second per unit of angle). The model is run twice, without
+delay and through a DelayLine with the same delay as the real loop. The controller
+then acts on
+
+    predicted = measured + model(now) - model(now - delay)
+
+which is the error the car will see once the commands already in the queue have taken
+effect. With a perfect model the delay drops out of the feedback loop entirely.
+
+Usage:
+    smith = smith_predictor.SmithPredictor(kp=-0.003125, plant_gain=800, delay=LAGTIME)
+    angle = smith.step(error, rc.get_delta_time())   # None error = no detection
+    queue.push(angle)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import time
+
+from delay_line import DelayLine
+
+########################################################################################
+# Classes
+########################################################################################
+
+class SmithPredictor:
+    """
+    P/PD controller with Smith-predictor delay compensation on an integrating plant.
+    """
+
+    def __init__(self, kp, plant_gain, delay, tau=0.0, kd=0.0, output_limit=1.0):
+        self.kp = kp
+        self.kd = kd
+        self.plant_gain = plant_gain
+        self.tau = tau
+        self.output_limit = output_limit
+
+        self.model_delay = DelayLine(delay)
+        self.actuator = 0.0   # modelled steering angle actually reached
+        self.model_error = 0.0  # modelled line error without delay
+        self.output = 0.0
+        self.predicted = 0.0
+        self.prev_predicted = None
+
+    # [FUNCTION] Compute the next command from the measured (delayed) error
+    def step(self, error, dt, t=None):
+        if t is None:
+            t = time.monotonic()
+
+        if error is not None:
+            # Correct the stale measurement by what the queued commands will still do
+            self.predicted = error + self.model_error - self.model_delay.sample(t)
+            derivative = 0.0
+            if self.prev_predicted is not None and dt > 0:
+                derivative = (self.predicted - self.prev_predicted) / dt
+            self.prev_predicted = self.predicted
+
+            output = self.kp * self.predicted + self.kd * derivative
+            self.output = max(-self.output_limit, min(self.output_limit, output))
+
+        # Advance the internal model with the command that is about to enter the queue
+        if self.tau > 0:
+            self.actuator += (self.output - self.actuator) * min(dt / self.tau, 1.0)
+        else:
+            self.actuator = self.output
+        self.model_error += self.plant_gain * self.actuator * dt
+        self.model_delay.push(self.model_error, t)
+        return self.output
+
+    # [FUNCTION] Reset the internal model (e.g. when start() is pressed again)
+    def reset(self):
+        self.model_delay.clear()
+        self.actuator = 0.0
+        self.model_error = 0.0
+        self.output = 0.0
+        self.predicted = 0.0
+        self.prev_predicted = None
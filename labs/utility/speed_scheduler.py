@@ -0,0 +1,113 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: speed_scheduler.py
+
+Title: Curvature-Aware Speed Scheduler
+
+Purpose: Drive fast on straights and slow only where the line bends. With a constant
+S_VALUE the whole lap runs at the speed the tightest corner can survive.
+
+The speed limit comes from a lookup table over (line curvature, |steering|) that is
+precomputed once. By default each cell holds the speed that keeps the lateral
+acceleration v^2 * curvature under lateral_accel, using the larger of the measured line
+curvature and the curvature the current steering angle drives, clamped to
+[min_speed, max_speed]. Any other (curvature_bins, steer_bins) table can be passed in.
+
+Unless lateral_accel is given, it is scaled to the commanded max_speed: the limit is the
+lateral acceleration of driving max_speed at a steering angle of full_speed_steer, so
+the car slows for any steering beyond that at every S_VALUE (a fixed limit only takes
+effect above the speed it allows at full lock, e.g. about 0.67 for 2 m/s^2).
+
+The steering input is a peak hold over roughly the last `history` seconds, so the car
+stays slow through a corner and only speeds up once the steering has settled. The
+output is rate limited: it can drop quickly (decel_limit) but only rises gently
+(accel_limit), in rc.drive speed units per second.
+
+Usage:
+    scheduler = speed_scheduler.SpeedScheduler(max_speed=0.8, min_speed=0.3)
+    limit = scheduler.update(angle, rc.get_delta_time(), curvature=None)
+    speed = rc_utils.clamp(speed, -limit, limit)
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import math
+
+import numpy as np
+
+from vehicle import MAX_SPEED, MAX_STEER, WHEELBASE
+
+########################################################################################
+# Functions
+########################################################################################
+
+# [FUNCTION] Speed limit table (rc.drive units) from a lateral acceleration limit
+def lateral_accel_table(curvatures, steers, lateral_accel, min_speed, max_speed):
+    steer_curvature = np.tan(np.asarray(steers) * MAX_STEER) / WHEELBASE
+    curvature = np.maximum(np.asarray(curvatures)[:, None], steer_curvature[None, :])
+    with np.errstate(divide="ignore"):
+        speed = np.sqrt(lateral_accel / curvature) / MAX_SPEED
+    return np.clip(speed, min_speed, max_speed)
+
+########################################################################################
+# Classes
+########################################################################################
+
+class SpeedScheduler:
+    """
+    Rate-limited speed limit looked up from (curvature, steering peak).
+    """
+
+    def __init__(self, max_speed, min_speed=0.2, lateral_accel=None, full_speed_steer=0.25,
+                 accel_limit=0.5, decel_limit=3.0, history=0.5, max_curvature=3.0,
+                 curvature_bins=32, steer_bins=32, table=None):
+        self.max_speed = max_speed
+        self.min_speed = min_speed
+        self.accel_limit = accel_limit  # speed units per second
+        self.decel_limit = decel_limit
+        self.history = history  # s for the steering peak to decay from 1 to 0
+        self.max_curvature = max_curvature  # 1/m, last curvature bin
+
+        if lateral_accel is None:
+            # m/s^2 of max_speed on the arc driven at full_speed_steer
+            steer_curvature = math.tan(full_speed_steer * MAX_STEER) / WHEELBASE
+            lateral_accel = (max_speed * MAX_SPEED) ** 2 * steer_curvature
+        self.lateral_accel = lateral_accel
+
+        if table is None:
+            curvatures = np.linspace(0, max_curvature, curvature_bins)
+            steers = np.linspace(0, 1, steer_bins)
+            table = lateral_accel_table(curvatures, steers, lateral_accel, min_speed, max_speed)
+        # Nested lists: a Python index is cheaper than numpy scalar access per frame
+        self.table = np.asarray(table, np.float64).tolist()
+        self.curvature_step = max_curvature / (len(self.table) - 1)
+        self.steer_step = 1.0 / (len(self.table[0]) - 1)
+        self.reset()
+
+    # [FUNCTION] Start over at the lowest speed (e.g. when start() is pressed again)
+    def reset(self):
+        self.steer_peak = 0.0
+        self.limit = self.min_speed
+
+    # [FUNCTION] Table entry nearest to (|curvature|, |steering|)
+    def lookup(self, curvature, steer):
+        i = min(int(abs(curvature) / self.curvature_step + 0.5), len(self.table) - 1)
+        j = min(int(abs(steer) / self.steer_step + 0.5), len(self.table[0]) - 1)
+        return self.table[i][j]
+
+    # [FUNCTION] Next speed limit from the steering angle and optional line curvature (1/m)
+    def update(self, angle, dt, curvature=None):
+        decay = dt / self.history if self.history > 0 else 1.0
+        self.steer_peak = max(abs(angle), self.steer_peak - decay)
+
+        target = self.lookup(curvature or 0.0, self.steer_peak)
+        if target > self.limit:
+            self.limit = min(target, self.limit + self.accel_limit * dt)
+        else:
+            self.limit = max(target, self.limit - self.decel_limit * dt)
+        return self.limit
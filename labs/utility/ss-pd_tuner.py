@@ -33,13 +33,14 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import font as tkfont
 import threading
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 # Import RACECAR Library from local file path
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import shm_plotter
+import async_log
+import pid
 
 # Create RACECAR object
 rc = racecar_core.create_racecar()
@@ -55,10 +56,17 @@ setpoint = 50 # cm
 kp = 0
 lidar_angle = 30 # total angle (both sides)
 
+# Safety stop P-controller on the LIDAR distance; gain and limits follow the trackbars
+stop_pid = pid.PID(kp=0)
+
+# Per-frame debug statements are written by a background thread at most 10 times per second
+logger = async_log.AsyncLogger(period=0.1)
+
 # Variables for data logging and mapping
 global loc_history
 hist_len = 250 # save this many frames
-loc_history = [0] * hist_len
+loc_history = shm_plotter.SharedRingBuffer(("loc", "setpoint"), hist_len) # setpoint is shared for the plot process
+plot_process = None # live plot process, replaced on every start()
 
 # [FUNCTION] UI -> RACECAR variable mapping
 def on_speed_change(val):
@@ -188,48 +196,26 @@ def create_gui():
 
     root.mainloop()
 
-# [FUCTION] Function to graph data to screen - threaded
+# [FUCTION] Function to graph data to screen - separate process
 def graph_data():
-    fig, ax = plt.subplots()
-    line, = ax.plot(range(hist_len), list(loc_history), label="Line Position")
-    setpoint_line = ax.axhline(y=int(setpoint), color='red', linestyle='--', label='Setpoint')
-
-    # Set title and label
-    ax.set_title("Plot of Distance from Wall vs. Frame #")
-    ax.set_xlabel("Frame Number")
-    ax.set_ylabel("Distance (cm)")
-
-    def update_plot(frame):
-        line.set_ydata(loc_history)
-        setpoint_line.set_ydata(int(setpoint))
-        return line, setpoint_line
-    
-    # Set plot limits
-    ax.set_ylim(0, int(setpoint) * 3)
-    ax.set_xlim(0, int(hist_len) - 1)
-
-    # Add legend
-    ax.legend()
-
-    # Start animation
-    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
-
-    # Show plot
-    plt.show()
+    return shm_plotter.start_plot_process(
+        loc_history, title="Plot of Distance from Wall vs. Frame #", ylabel="Distance (cm)",
+        ylim=(0, int(setpoint) * 3), lines=[{"channel": "loc", "label": "Line Position"}],
+        setpoint="setpoint")
 
 # [FUNCTION] Start function
 def start():
-    global speed, angle
+    global speed, angle, plot_process
     # Set initial driving speed and angle
     speed = 0
     angle = 0
     rc.drive.set_speed_angle(speed, angle)
 
-    # Thread it
+    # Plot in a separate process, GUI in a thread
+    shm_plotter.stop_plot_process(plot_process)
+    plot_process = graph_data()
     gui_thread = threading.Thread(target=create_gui)
     gui_thread.start()
-    graph_thread = threading.Thread(target=graph_data)
-    graph_thread.start()
 
     # Print start message
     print(
@@ -266,11 +252,12 @@ def update():
     loc_angle, distance = rc_utils.get_lidar_closest_point(scan, window)
     error = setpoint - distance
     kp_now = -1/setpoint * kp/100 * 2
+    stop_pid.kp = kp_now
+    stop_pid.output_limits = (-tune_speed, tune_speed)
 
     # Automatically adjust speed based on error if error > setpoint * 2
     if error > -setpoint:
-        speed = kp_now * error
-        speed = rc_utils.clamp(speed, -tune_speed, tune_speed)
+        speed = stop_pid.update(distance, setpoint, rc.get_delta_time())
         if b < -0.1:
             speed = rc_utils.clamp(b, -tune_speed, tune_speed)
     else:
@@ -281,12 +268,11 @@ def update():
     angle = rc_utils.clamp(angle, -1, 1)
 
     # Location history graph update
-    if len(loc_history) >= hist_len: 
-        loc_history.pop(-1)
-    loc_history.insert(0, distance)
+    loc_history.append(distance, setpoint)
 
     # Print debug statement
-    print(f"Distance to wall: {round(distance,2)} || Kp: {kp_now} || Speed: {round(speed,2)} || Angle: {round(angle,2)} || Error: {round(error,2)}")
+    logger.log("Distance to wall: {} || Kp: {} || Speed: {} || Angle: {} || Error: {}",
+               round(distance,2), kp_now, round(speed,2), round(angle,2), round(error,2))
     
     # Send speed and angle to the car if trigger is pressed
     if rc.controller.get_trigger(rc.controller.Trigger.RIGHT) > 0:
@@ -303,7 +289,7 @@ def update():
 
     # Print statements from buttons
     if rc.controller.is_down(rc.controller.Button.A):
-        print(f"Speed: {speed} || Angle: {angle}")
+        logger.log("Speed: {} || Angle: {}", speed, angle)
     
     if rc.controller.was_pressed(rc.controller.Button.B):
         print(f"Speed coefficient: {tune_speed}% || Angle offset: {angle_offset*0.0025} || Setpoint: {setpoint}cm || Sensitivity: {kp}% || LIDAR Window: {lidar_angle}")
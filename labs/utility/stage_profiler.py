@@ -0,0 +1,159 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: stage_profiler.py
+
+Title: Stage Profiler
+
+Purpose: Find out which part of update() makes a loop slow (camera read, contour search,
+drawing, display, LIDAR read, drive command, inference, ...).
+
+Each stage keeps its last `window` durations from time.perf_counter_ns() in a
+preallocated array, plus an all-run histogram in power-of-two microsecond bins.
+report() returns rolling p50/p95/p99 per stage (meant for update_slow()) and the
+histogram is printed when the program exits.
+
+Usage:
+    profiler = stage_profiler.StageProfiler()
+
+    with profiler.stage("get_color_image"):
+        image = rc.camera.get_color_image()
+
+    @profiler.timed("process_objects")
+    def process_objects(image, objs): ...
+
+    def update_slow():
+        print(profiler.report())
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import atexit
+import functools
+import time
+
+import numpy as np
+
+########################################################################################
+# Classes
+########################################################################################
+
+class _Stage:
+    """
+    Timing slots of one stage; also its own (reusable) context manager.
+    """
+
+    HIST_BINS = 32  # bin k holds durations in [2^(k-1), 2^k) microseconds
+
+    def __init__(self, name, window):
+        self.name = name
+        self.samples = np.zeros(window, np.int64)
+        self.histogram = np.zeros(self.HIST_BINS, np.int64)
+        self.count = 0
+        self.start = 0
+
+    def add(self, elapsed_ns):
+        self.samples[self.count % len(self.samples)] = elapsed_ns
+        self.count += 1
+        self.histogram[min((elapsed_ns // 1000).bit_length(), self.HIST_BINS - 1)] += 1
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.add(time.perf_counter_ns() - self.start)
+
+    # [FUNCTION] Rolling (p50, p95, p99) in milliseconds over the current window
+    def percentiles(self):
+        filled = self.samples[:min(self.count, len(self.samples))]
+        if len(filled) == 0:
+            return (0.0, 0.0, 0.0)
+        return tuple(np.percentile(filled, (50, 95, 99)) / 1e6)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class StageProfiler:
+    """
+    Named stage timers backed by preallocated arrays.
+
+    With enabled=False every stage is a shared no-op context manager, so the
+    instrumentation can stay in the code at no cost.
+    """
+
+    def __init__(self, window=600, enabled=True, dump_on_exit=True):
+        self.window = window
+        self.enabled = enabled
+        self.stages = {}
+        self.null_stage = _NullStage()
+        if enabled and dump_on_exit:
+            atexit.register(self.dump_histogram)
+
+    # [FUNCTION] Context manager timing one stage (created on first use, then reused)
+    def stage(self, name):
+        if not self.enabled:
+            return self.null_stage
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = _Stage(name, self.window)
+        return stage
+
+    # [FUNCTION] Decorator timing every call of a function as one stage
+    def timed(self, name=None):
+        def decorator(func):
+            stage_name = func.__name__ if name is None else name
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    # [FUNCTION] Record an externally measured duration (e.g. from another thread)
+    def add(self, name, elapsed_ns):
+        if self.enabled:
+            self.stage(name).add(elapsed_ns)
+
+    # [FUNCTION] Most recent duration of a stage in milliseconds (None if never timed)
+    def last_ms(self, name):
+        stage = self.stages.get(name)
+        if stage is None or stage.count == 0:
+            return None
+        return stage.samples[(stage.count - 1) % len(stage.samples)] / 1e6
+
+    # [FUNCTION] Rolling percentiles of every stage as a printable table
+    def report(self):
+        if not self.stages:
+            return ""
+        width = max(len(name) for name in self.stages)
+        lines = [f"{'Stage':<{width}} ||   p50 ms |   p95 ms |   p99 ms"]
+        for name, stage in self.stages.items():
+            p50, p95, p99 = stage.percentiles()
+            lines.append(f"{name:<{width}} || {p50:8.3f} | {p95:8.3f} | {p99:8.3f}")
+        return "\n".join(lines)
+
+    # [FUNCTION] Print the whole-run histogram of every stage
+    def dump_histogram(self):
+        if not self.stages:
+            return
+        print(">> Stage timing histogram (whole run)")
+        for name, stage in self.stages.items():
+            print(f"{name}: {stage.count} calls")
+            peak = max(int(stage.histogram.max()), 1)
+            for k in np.flatnonzero(stage.histogram):
+                low = 0 if k == 0 else 1 << (k - 1)
+                bar = "#" * max(1, int(40 * stage.histogram[k] / peak))
+                print(f"    {low:>8} - {1 << k:<8} us | {stage.histogram[k]:>7} {bar}")
@@ -0,0 +1,143 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: steering_estimator.py
+
+Title: IMU-Aided Line Estimator
+
+Purpose: Keep the line-following error fresh between camera frames. The camera delivers
+a new contour at most every frame and ~100 ms late, while the gyroscope in
+rc.physics.get_angular_velocity() reports how the car is turning right now.
+
+A three-state Kalman filter tracks
+- offset: lateral position of the line right of the car (m)
+- heading: angle of the line to the right of the car's heading (rad)
+- bias: gyro yaw-rate bias (rad/s)
+with the kinematics offset' = v * heading and heading' = -(yaw_rate - bias). Every
+control step predict() propagates the state with the measured yaw rate and speed;
+correct() fuses a vision measurement whenever a new frame arrives. The vision error is
+the same pixel error the labs already use (setpoint - column), which sees the line
+lookahead metres ahead:
+
+    error = -px_per_m * (offset + lookahead * heading)
+
+The state always describes the present. A frame shows the line as it was `latency`
+seconds ago, so correct() compares it against the present estimate minus the change
+predict() has applied since then (a running sum read back through a DelayLine), and
+error() returns the present-time pixel error: the steering
+controller acts on where the line is now rather than where it was when the frame was
+taken. correct() takes a key of the camera frame the error was measured on (anything
+that changes with every new frame, e.g. a capture timestamp or a fingerprint of the
+image) and skips a key it has just fused, so a loop running faster than the camera does
+not fuse the same frame twice.
+
+yaw_sign maps rc.physics.get_angular_velocity()[1] to "positive = turning right"
+(the simulator's convention); flip it if the estimate runs away while turning.
+
+Usage:
+    estimator = steering_estimator.SteeringEstimator()
+    estimator.predict(rc.physics.get_angular_velocity()[1], drive_speed * steering_estimator.MAX_SPEED,
+                      rc.get_delta_time())
+    if contour_center is not None:
+        estimator.correct(160 - contour_center[1], frame=frame_key)
+    error = estimator.error()
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import time
+
+import numpy as np
+
+from delay_line import DelayLine
+from vehicle import MAX_SPEED  # re-exported for callers converting rc.drive speed to m/s
+
+########################################################################################
+# Classes
+########################################################################################
+
+class SteeringEstimator:
+    """
+    Kalman filter on (line offset, line heading, gyro bias) from yaw rate and vision.
+    """
+
+    def __init__(self, px_per_m=400, lookahead=0.4, latency=0.1, pixel_noise=4.0,
+                 offset_noise=0.05, heading_noise=0.5, bias_noise=0.01, yaw_sign=1.0,
+                 clock=time.monotonic):
+        self.px_per_m = px_per_m  # px of column per metre of offset at the look-ahead
+        self.lookahead = lookahead  # m, where the floor crop sees the line
+        self.latency = latency  # s, camera exposure + processing delay
+        self.yaw_sign = yaw_sign
+        self.clock = clock
+
+        # Process noise densities (per second) and measurement noise
+        self.q = np.diag([offset_noise ** 2, heading_noise ** 2, bias_noise ** 2])
+        self.r = pixel_noise ** 2
+        self.h = np.array([-px_per_m, -px_per_m * lookahead, 0.0])
+        self.reset()
+
+    # [FUNCTION] Forget the estimate (e.g. when start() is pressed again)
+    def reset(self):
+        self.x = np.zeros(3)
+        self.p = np.diag([0.2 ** 2, 0.5 ** 2, 0.05 ** 2])
+        self.initialized = False
+        self.yaw_rate = 0.0
+        self.speed = 0.0
+        self.last_frame = None  # key of the last fused camera frame
+        self.motion = 0.0  # running sum of the pixel error change applied by predict()
+        self.history = DelayLine(self.latency, capacity=256)  # self.motion over time
+
+    # [FUNCTION] Propagate with the gyro yaw rate (rad/s) and forward speed (m/s) over dt
+    def predict(self, yaw_rate, speed, dt, t=None):
+        if dt <= 0:
+            return
+        if t is None:
+            t = self.clock()
+        self.yaw_rate = self.yaw_sign * yaw_rate
+        self.speed = speed
+        offset, heading, bias = self.x
+        before = self.h @ self.x
+        self.x = np.array([offset + speed * heading * dt,
+                           heading - (self.yaw_rate - bias) * dt,
+                           bias])
+        f = np.array([[1.0, speed * dt, 0.0],
+                      [0.0, 1.0, dt],
+                      [0.0, 0.0, 1.0]])
+        self.p = f @ self.p @ f.T + self.q * dt
+        self.motion += float(self.h @ self.x - before)
+        self.history.push(self.motion, t)
+
+    # [FUNCTION] Fuse a vision pixel error (setpoint - column); returns False if the frame was already fused
+    def correct(self, error, t=None, frame=None):
+        if frame is not None:
+            if frame == self.last_frame:
+                return False
+            self.last_frame = frame
+        if t is None:
+            t = self.clock()
+
+        if not self.initialized:
+            # Start from the measurement, attributed to offset with heading unknown
+            self.x = np.array([-error / self.px_per_m, 0.0, 0.0])
+            self.initialized = True
+            return True
+
+        # The frame saw the line `latency` ago: undo the motion predicted since then
+        h = self.h
+        predicted = h @ self.x - (self.motion - self.history.sample(t))
+        ph = self.p @ h
+        gain = ph / (h @ ph + self.r)
+        self.x = self.x + gain * (error - predicted)
+        self.p = self.p - np.outer(gain, ph)
+        return True
+
+    # [FUNCTION] Present pixel error (setpoint - column) of the line, `ahead` seconds in the future
+    def error(self, ahead=0.0):
+        offset, heading, bias = self.x
+        heading_ahead = heading - (self.yaw_rate - bias) * ahead
+        offset_ahead = offset + self.speed * 0.5 * (heading + heading_ahead) * ahead
+        return float(self.h[0] * offset_ahead + self.h[1] * heading_ahead)
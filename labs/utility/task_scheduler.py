@@ -0,0 +1,166 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: task_scheduler.py
+
+Title: Multi-Rate Task Scheduler
+
+Purpose: Run parts of a lab at their own rates instead of everything at the frame rate
+of update() or the one rate of update_slow(). A safety-critical LIDAR check, vision and
+a UI refresh rarely need the same rate.
+
+Tasks are registered with a rate (Hz) and a priority and are called with the time since
+their previous run:
+- main-thread tasks run from run_due(), which update() calls every frame: every task
+  whose deadline has passed runs, highest priority first. They may drive the car.
+- threaded tasks run on one background worker thread with its own timing, so a slow
+  plot or log flush never stalls update(). Only register tasks there that do not send
+  drive commands (rc.drive must only be touched from the main loop).
+
+Every task keeps overrun accounting: runs, overruns (a run took longer than its period),
+skipped periods (the task was due more than one period ago and the missed runs were
+dropped rather than bunched up) and mean/max run time. A task that raises is counted
+(its first error is printed) and keeps being scheduled, so one bad LIDAR scan cannot end
+the worker thread.
+
+Note that main-thread tasks cannot run faster than update() is called.
+
+Usage:
+    scheduler = task_scheduler.TaskScheduler()
+    scheduler.add("lidar", check_lidar, rate=40, priority=10)
+    scheduler.add("plot", refresh_plot, rate=5, threaded=True)
+    scheduler.start()        # worker thread for threaded tasks
+    scheduler.run_due()      # in update()
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import threading
+import time
+
+########################################################################################
+# Classes
+########################################################################################
+
+class Task:
+    """
+    Periodic task with timing statistics.
+    """
+
+    def __init__(self, name, fn, rate, priority=0, threaded=False):
+        self.name = name
+        self.fn = fn
+        self.period = 1.0 / rate
+        self.priority = priority
+        self.threaded = threaded
+        self.next_due = None
+        self.last_run = None
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    # [FUNCTION] Call the task if due at time now; returns True if it ran
+    def run_if_due(self, now, clock):
+        if self.next_due is None:
+            self.next_due = now
+        if now < self.next_due:
+            return False
+
+        # More than a full period late: drop the missed runs instead of catching up
+        late = now - self.next_due
+        if late >= self.period:
+            missed = int(late / self.period)
+            self.skipped += missed
+            self.next_due += missed * self.period
+        self.next_due += self.period
+
+        dt = 0.0 if self.last_run is None else now - self.last_run
+        self.last_run = now
+        start = clock()  # not `now`: earlier tasks in the same pass are not this task's time
+        try:
+            self.fn(dt)
+        except Exception as error:
+            if self.errors == 0:
+                print(f">> Task {self.name!r} raised {error!r} (further errors are only counted)")
+            self.errors += 1
+            self.last_error = error
+
+        elapsed = clock() - start
+        self.runs += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if elapsed > self.period:
+            self.overruns += 1
+        return True
+
+
+class TaskScheduler:
+    """
+    Runs periodic tasks at independent rates from update() and a worker thread.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.tasks = []
+        self.main_tasks = []
+        self.threaded_tasks = []
+        self.worker = None
+        self.running = threading.Event()
+
+    # [FUNCTION] Register fn(dt) to run at rate Hz; threaded=True only without drive commands
+    def add(self, name, fn, rate, priority=0, threaded=False):
+        task = Task(name, fn, rate, priority, threaded)
+        self.tasks.append(task)
+        group = self.threaded_tasks if threaded else self.main_tasks
+        group.append(task)
+        group.sort(key=lambda t: -t.priority)
+        return task
+
+    # [FUNCTION] Run every due main-thread task, highest priority first (call from update())
+    def run_due(self):
+        now = self.clock()
+        for task in self.main_tasks:
+            task.run_if_due(now, self.clock)
+
+    # [FUNCTION] Start the worker thread for threaded tasks (no-op if there are none)
+    def start(self):
+        if self.worker is not None or not self.threaded_tasks:
+            return
+        self.running.set()
+        self.worker = threading.Thread(target=self._work, name="task_scheduler", daemon=True)
+        self.worker.start()
+
+    # [FUNCTION] Stop the worker thread
+    def stop(self):
+        self.running.clear()
+        if self.worker is not None:
+            self.worker.join(timeout=1.0)
+            self.worker = None
+
+    def _work(self):
+        while self.running.is_set():
+            now = self.clock()
+            for task in self.threaded_tasks:
+                task.run_if_due(now, self.clock)
+            # Sleep until the next threaded task is due
+            next_due = min(task.next_due for task in self.threaded_tasks)
+            time.sleep(max(0.0, min(next_due - self.clock(), 0.1)))
+
+    # [FUNCTION] Multi-line table of rate, run time and overruns per task
+    def report(self):
+        lines = [f"{'task':<12} {'Hz':>6} {'runs':>6} {'mean':>7} {'max':>7} {'overrun':>7} {'skipped':>7} "
+                 f"{'errors':>6}"]
+        for task in self.tasks:
+            mean = 1000 * task.total_time / task.runs if task.runs else 0.0
+            lines.append(f"{task.name:<12} {1 / task.period:6.1f} {task.runs:6d} {mean:5.2f}ms "
+                         f"{1000 * task.max_time:5.2f}ms {task.overruns:7d} {task.skipped:7d} "
+                         f"{task.errors:6d}")
+        return "\n".join(lines)
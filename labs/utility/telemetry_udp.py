@@ -0,0 +1,271 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: telemetry_udp.py
+
+Title: UDP Telemetry Stream
+
+Purpose: Stream per-frame telemetry from the car to a laptop dashboard instead of
+running tkinter/matplotlib on the car itself.
+
+Each sample is a fixed 32 byte record (timestamp, speed, angle, error, contour center,
+LIDAR closest distance, loop time). Samples are batched several per datagram behind a
+small header with a sequence number so the receiver can count lost datagrams (forward
+gaps in the sequence) and late ones (reordered or duplicated, counted apart). The
+publisher socket is non-blocking: if the kernel send buffer is full the batch is
+dropped and counted instead of stalling update().
+
+Usage (car):
+    telemetry = telemetry_udp.TelemetryPublisher("192.168.1.20")
+    telemetry.publish(speed, angle, error, contour_center[1], distance, rc.get_delta_time())
+
+Usage (laptop):
+    python telemetry_udp.py            # print rolling statistics
+    python telemetry_udp.py --plot     # live matplotlib dashboard
+    python telemetry_udp.py --check    # publisher -> receiver round trip over localhost
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+
+########################################################################################
+# Constants
+########################################################################################
+
+DEFAULT_PORT = 5800
+MAGIC = b"RCTM"
+
+HEADER = struct.Struct("<4sIH")  # magic, datagram sequence number, sample count
+SAMPLE = struct.Struct("<d6f")   # timestamp, speed, angle, error, contour_center, lidar_distance, loop_time
+
+SAMPLE_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("speed", "<f4"),
+    ("angle", "<f4"),
+    ("error", "<f4"),
+    ("contour_center", "<f4"),
+    ("lidar_distance", "<f4"),
+    ("loop_time", "<f4"),
+])
+
+########################################################################################
+# Classes
+########################################################################################
+
+class TelemetryPublisher:
+    """
+    Batches telemetry samples into UDP datagrams without ever blocking the caller.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, batch=8):
+        self.address = (host, port)
+        self.batch = batch
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+        self.packet = bytearray(HEADER.size + batch * SAMPLE.size)
+        self.count = 0
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+    # [FUNCTION] Add one sample; a datagram goes out every `batch` samples
+    def publish(self, speed, angle, error, contour_center, lidar_distance, loop_time,
+                timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if contour_center is None:
+            contour_center = float("nan")
+        SAMPLE.pack_into(self.packet, HEADER.size + self.count * SAMPLE.size, timestamp,
+                         speed, angle, error, contour_center, lidar_distance, loop_time)
+        self.count += 1
+        if self.count == self.batch:
+            self.flush()
+
+    # [FUNCTION] Send whatever samples are buffered
+    def flush(self):
+        if self.count == 0:
+            return
+        HEADER.pack_into(self.packet, 0, MAGIC, self.sequence, self.count)
+        size = HEADER.size + self.count * SAMPLE.size
+        try:
+            self.sock.sendto(memoryview(self.packet)[:size], self.address)
+            self.sent += self.count
+        except OSError:
+            # Back-pressure (EAGAIN) or no route to the laptop: drop, never block
+            self.dropped += self.count
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.sock.close()
+
+
+class TelemetryReceiver:
+    """
+    Receives telemetry datagrams and decodes them into SAMPLE_DTYPE arrays.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+        self.buffer = bytearray(65536)
+        self.next_sequence = None
+        self.received = 0
+        self.lost_datagrams = 0
+        self.late_datagrams = 0  # reordered or duplicated
+
+    # [FUNCTION] Wait up to timeout seconds for one datagram; returns an empty array on timeout
+    def receive(self, timeout=1.0):
+        self.sock.settimeout(timeout)
+        try:
+            size = self.sock.recv_into(self.buffer)
+        except socket.timeout:
+            return np.empty(0, SAMPLE_DTYPE)
+        if size < HEADER.size:
+            return np.empty(0, SAMPLE_DTYPE)
+
+        magic, sequence, count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or HEADER.size + count * SAMPLE.size > size:
+            return np.empty(0, SAMPLE_DTYPE)
+        if self.next_sequence is None:
+            self.next_sequence = sequence
+        # Forward gaps (mod 2^32) of less than half the sequence space are lost datagrams;
+        # anything else arrived after a newer one (reordered or duplicated)
+        gap = (sequence - self.next_sequence) & 0xFFFFFFFF
+        if gap < 0x80000000:
+            self.lost_datagrams += gap
+            self.next_sequence = (sequence + 1) & 0xFFFFFFFF
+        else:
+            self.late_datagrams += 1
+
+        self.received += count
+        return np.frombuffer(self.buffer, SAMPLE_DTYPE, count, HEADER.size).copy()
+
+    def close(self):
+        self.sock.close()
+
+########################################################################################
+# Dashboard
+########################################################################################
+
+# [FUNCTION] Print rolling statistics of the incoming stream once per second
+def print_dashboard(receiver):
+    last_print = time.monotonic()
+    latest = None
+    loop_times = []
+    while True:
+        samples = receiver.receive()
+        if len(samples):
+            latest = samples[-1]
+            loop_times.extend(samples["loop_time"])
+        if time.monotonic() - last_print >= 1 and latest is not None:
+            loop_ms = 1000 * np.mean(loop_times) if loop_times else float("nan")
+            print(f"Speed: {latest['speed']:5.2f} || Angle: {latest['angle']:5.2f} || "
+                  f"Error: {latest['error']:7.1f} || Center: {latest['contour_center']:6.1f} || "
+                  f"LIDAR: {latest['lidar_distance']:6.1f}cm || Loop: {loop_ms:5.1f}ms || "
+                  f"Lost datagrams: {receiver.lost_datagrams} (late: {receiver.late_datagrams})")
+            loop_times = []
+            last_print = time.monotonic()
+
+
+# [FUNCTION] Live matplotlib dashboard of error, angle and speed
+def plot_dashboard(receiver, hist_len=600):
+    import threading
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+    from ring_buffer import RingBuffer
+
+    history = RingBuffer(("error", "angle", "speed", "lidar_distance"), hist_len)
+
+    def receive_forever():
+        while True:
+            for sample in receiver.receive():
+                history.append(sample["error"], sample["angle"], sample["speed"],
+                               sample["lidar_distance"])
+
+    threading.Thread(target=receive_forever, daemon=True).start()
+
+    fig, (ax, ax_speed) = plt.subplots(2, 1, sharex=True)
+    ax2 = ax.twinx()
+    frame = history.snapshot()
+    error_line, = ax.plot(range(hist_len), frame["error"], label="Error")
+    angle_line, = ax2.plot(range(hist_len), frame["angle"], color='tab:orange', label="Angle")
+    speed_line, = ax_speed.plot(range(hist_len), frame["speed"], label="Speed")
+    ax.set_title("RACECAR Telemetry vs. Sample #")
+    ax.set_ylabel("Error")
+    ax.set_ylim(-320, 320)
+    ax2.set_ylim(-1, 1)
+    ax_speed.set_ylim(-1, 1)
+    ax_speed.set_xlim(0, hist_len - 1)
+    ax_speed.set_xlabel("Sample Number")
+    ax.legend([error_line, angle_line], ["Error", "Angle"], loc="upper right")
+    ax_speed.legend(loc="upper right")
+
+    def update_plot(i):
+        frame = history.snapshot()
+        error_line.set_ydata(frame["error"])
+        angle_line.set_ydata(frame["angle"])
+        speed_line.set_ydata(frame["speed"])
+        return error_line, angle_line, speed_line
+
+    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
+    plt.show()
+
+
+# [FUNCTION] Publish samples to a receiver on localhost and check every one arrives intact
+def loopback_check(samples=200, batch=8):
+    receiver = TelemetryReceiver(port=0, host="127.0.0.1")
+    publisher = TelemetryPublisher("127.0.0.1", receiver.port, batch=batch)
+    for i in range(samples):
+        publisher.publish(i / samples, -i / samples, float(i), None if i % 2 else float(i),
+                          100.0 - i, 1 / 60, timestamp=float(i))
+    publisher.flush()
+
+    received = []
+    while sum(map(len, received)) < samples:
+        chunk = receiver.receive(timeout=1.0)
+        if not len(chunk):
+            break
+        received.append(chunk)
+    data = np.concatenate(received) if received else np.empty(0, SAMPLE_DTYPE)
+
+    # A duplicated and a reordered datagram must count as late, not as ~2^32 lost
+    HEADER.pack_into(publisher.packet, 0, MAGIC, 0, 1)
+    publisher.sock.sendto(memoryview(publisher.packet)[:HEADER.size + SAMPLE.size], publisher.address)
+    receiver.receive(timeout=1.0)
+    publisher.close()
+    receiver.close()
+
+    index = np.arange(samples)
+    ok = (len(data) == samples and np.array_equal(data["timestamp"], index)
+          and np.allclose(data["error"], index) and np.isnan(data["contour_center"][1::2]).all()
+          and publisher.dropped == 0 and receiver.lost_datagrams == 0
+          and receiver.late_datagrams == 1)
+    print(f"{'OK' if ok else 'FAILED'}: {len(data)}/{samples} samples, "
+          f"{receiver.lost_datagrams} lost, {receiver.late_datagrams} late, "
+          f"{publisher.dropped} dropped by the publisher")
+    return ok
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv:
+        sys.exit(0 if loopback_check() else 1)
+    receiver = TelemetryReceiver(DEFAULT_PORT)
+    print(f">> Listening for RACECAR telemetry on UDP port {receiver.port}")
+    if "--plot" in sys.argv:
+        plot_dashboard(receiver)
+    else:
+        print_dashboard(receiver)
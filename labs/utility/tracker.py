@@ -0,0 +1,138 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: tracker.py
+
+Title: Bounding Box Tracker
+
+Purpose: Follow one detected object smoothly when detections are sparse. Without a
+tracker, carfollower.py stops the car on any frame without a detection and needs a full
+inference every frame.
+
+A constant-velocity Kalman filter tracks the box center (cx, cy, vx, vy) and size
+(w, h) in camera pixels:
+- predict(dt) runs every control frame and moves the box along its velocity
+- update(objs) runs whenever a detection result arrives. The tracked box is matched to
+  the detection with the highest IoU against the prediction (at least iou_threshold).
+  Unmatched results count as misses, and a lost track restarts on the highest-scoring
+  detection
+Detections from a pipeline are `latency` seconds old; update() moves them forward by
+the tracked velocity before fusing.
+
+The track survives max_age seconds without a match, so inference can run on every Nth
+frame only and short dropouts do not stop the car.
+
+Usage:
+    track = tracker.BoxTracker(max_age=0.5)
+    track.predict(rc.get_delta_time())          # every frame
+    track.update(objs)                          # when new detections arrive
+    if track.bbox is not None: ...
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import numpy as np
+
+from inference_backend import BBox, iou
+
+########################################################################################
+# Classes
+########################################################################################
+
+class BoxTracker:
+    """
+    Single-target IoU + constant-velocity Kalman tracker for bounding boxes.
+    """
+
+    def __init__(self, max_age=0.5, iou_threshold=0.3, position_noise=50.0,
+                 velocity_noise=400.0, size_noise=30.0, measurement_noise=8.0):
+        self.max_age = max_age  # s without a match before the track is dropped
+        self.iou_threshold = iou_threshold
+        # Process noise densities (px^2/s, (px/s)^2/s) and bbox edge noise (px)
+        self.q = np.diag([position_noise ** 2, position_noise ** 2,
+                          velocity_noise ** 2, velocity_noise ** 2,
+                          size_noise ** 2, size_noise ** 2])
+        self.r = np.eye(4) * measurement_noise ** 2
+        self.h = np.zeros((4, 6))
+        self.h[0, 0] = self.h[1, 1] = self.h[2, 4] = self.h[3, 5] = 1.0
+        self.reset()
+
+    # [FUNCTION] Drop the track
+    def reset(self):
+        self.x = None  # (cx, cy, vx, vy, w, h)
+        self.p = None
+        self.age = 0.0  # s since the last matched detection
+        self.hits = 0
+        self.misses = 0
+        self.object = None  # last matched detection
+
+    # [FUNCTION] True while a track exists
+    @property
+    def active(self):
+        return self.x is not None
+
+    # [FUNCTION] Tracked box as a BBox, None without a track
+    @property
+    def bbox(self):
+        if self.x is None:
+            return None
+        cx, cy, _, _, w, h = self.x
+        return BBox(cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    # [FUNCTION] Advance the track by dt seconds (call every control frame)
+    def predict(self, dt):
+        if self.x is None or dt <= 0:
+            return
+        f = np.eye(6)
+        f[0, 2] = f[1, 3] = dt
+        self.x = f @ self.x
+        self.p = f @ self.p @ f.T + self.q * dt
+        self.age += dt
+        if self.age > self.max_age:
+            self.reset()
+
+    # [FUNCTION] Fuse a detection result (bboxes in camera pixels); True if the track matched
+    def update(self, objs, latency=0.0):
+        if not objs:
+            if self.x is not None:
+                self.misses += 1
+            return False
+
+        if self.x is None:
+            self._start(max(objs, key=lambda obj: obj.score))
+            return True
+
+        # Move detections forward to now, then match by IoU with the prediction
+        dx, dy = self.x[2] * latency, self.x[3] * latency
+        boxes = [obj.bbox.translate(dx, dy) for obj in objs]
+        predicted = self.bbox
+        overlaps = [iou(predicted, box) for box in boxes]
+        best = int(np.argmax(overlaps))
+        if overlaps[best] < self.iou_threshold:
+            self.misses += 1
+            return False
+
+        box = boxes[best]
+        z = np.array([(box.xmin + box.xmax) / 2, (box.ymin + box.ymax) / 2,
+                      box.xmax - box.xmin, box.ymax - box.ymin])
+        ph = self.p @ self.h.T
+        gain = ph @ np.linalg.inv(self.h @ ph + self.r)
+        self.x = self.x + gain @ (z - self.h @ self.x)
+        self.p = (np.eye(6) - gain @ self.h) @ self.p
+        self.age = 0.0
+        self.hits += 1
+        self.object = objs[best]
+        return True
+
+    def _start(self, obj):
+        box = obj.bbox
+        w, h = box.xmax - box.xmin, box.ymax - box.ymin
+        self.x = np.array([box.xmin + w / 2, box.ymin + h / 2, 0.0, 0.0, w, h])
+        self.p = np.diag([10.0, 10.0, 300.0, 300.0, 10.0, 10.0]) ** 2
+        self.age = 0.0
+        self.hits = 1
+        self.object = obj
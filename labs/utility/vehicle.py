@@ -0,0 +1,34 @@
+"""
+MIT BWSI Autonomous RACECAR
+MIT License
+racecar-neo-oneshot-labs
+
+File Name: vehicle.py
+
+Title: Vehicle Model Constants
+
+Purpose: One place for the RACECAR Neo constants shared by the steering, speed and
+simulation modules (pure_pursuit.py, speed_scheduler.py, steering_estimator.py,
+gain_sweep.py).
+
+These are estimates for the RACECAR Neo. Measure them on your car (wheelbase between
+the axles, wheel angle at full rc.drive steering, speed at rc.drive speed 1) and change
+them here if the car cuts corners, slows too late or the simulation does not match.
+
+Usage:
+    from vehicle import WHEELBASE, MAX_STEER, MAX_SPEED
+"""
+
+########################################################################################
+# Imports
+########################################################################################
+
+import math
+
+########################################################################################
+# Constants
+########################################################################################
+
+WHEELBASE = 0.325  # m
+MAX_STEER = math.radians(20)  # wheel angle at rc.drive angle = 1
+MAX_SPEED = 2.0  # m/s at rc.drive speed = 1
@@ -29,13 +29,13 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import font as tkfont
 import threading
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 # Import RACECAR Library from local file path
 sys.path.insert(1, '../../library')
 import racecar_core
 import racecar_utils as rc_utils
+import shm_plotter
+import async_log
 
 # Create RACECAR object
 rc = racecar_core.create_racecar()
@@ -50,10 +50,14 @@ global kp, lidar_angle
 kp = 0
 lidar_angle = 30 # total angle (both sides)
 
+# Per-frame debug statements are written by a background thread at most 10 times per second
+logger = async_log.AsyncLogger(period=0.1)
+
 # Variables for data logging and mapping
 global loc_history
 hist_len = 250 # save this many frames
-loc_history = [0] * hist_len
+loc_history = shm_plotter.SharedRingBuffer(("loc",), hist_len)
+plot_process = None # live plot process, replaced on every start()
 
 # [FUNCTION] UI -> RACECAR variable mapping
 def on_speed_change(val):
@@ -173,48 +177,25 @@ def create_gui():
 
     root.mainloop()
 
-# [FUCTION] Function to graph data to screen - threaded
+# [FUCTION] Function to graph data to screen - separate process
 def graph_data():
-    fig, ax = plt.subplots()
-    line, = ax.plot(range(hist_len), list(loc_history), label="Line Position")
-    setpoint_line = ax.axhline(y=int(0), color='red', linestyle='--', label='Setpoint')
-
-    # Set title and label
-    ax.set_title("Plot of Distance from Wall vs. Frame #")
-    ax.set_xlabel("Frame Number")
-    ax.set_ylabel("Distance (cm)")
-
-    def update_plot(frame):
-        line.set_ydata(loc_history)
-        setpoint_line.set_ydata(int(0))
-        return line, setpoint_line
-    
-    # Set plot limits
-    ax.set_ylim(-100, 100)
-    ax.set_xlim(0, int(hist_len) - 1)
-
-    # Add legend
-    ax.legend()
-
-    # Start animation
-    ani = animation.FuncAnimation(fig, update_plot, interval=33, blit=True)
-
-    # Show plot
-    plt.show()
+    return shm_plotter.start_plot_process(
+        loc_history, title="Plot of Distance from Wall vs. Frame #", ylabel="Distance (cm)",
+        ylim=(-100, 100), lines=[{"channel": "loc", "label": "Line Position"}], setpoint=0)
 
 # [FUNCTION] Start function
 def start():
-    global speed, angle
+    global speed, angle, plot_process
     # Set initial driving speed and angle
     speed = 0
     angle = 0
     rc.drive.set_speed_angle(speed, angle)
 
-    # Thread it
+    # Plot in a separate process, GUI in a thread
+    shm_plotter.stop_plot_process(plot_process)
+    plot_process = graph_data()
     gui_thread = threading.Thread(target=create_gui)
     gui_thread.start()
-    graph_thread = threading.Thread(target=graph_data)
-    graph_thread.start()
 
     # Print start message
     print(
@@ -244,12 +225,12 @@ def update():
     speed = tune_speed
 
     # Location history graph update
-    if len(loc_history) >= hist_len: 
-        loc_history.pop(-1)
-    loc_history.insert(0, error)
+    loc_history.append(error)
 
     # Print debug statement
-    print(f"Left Distance, Angle: {round(left_distance, 2)},{left_loc_angle} || Right Distance, Angle: {round(right_distance, 2)}, {right_loc_angle} || Error: {round(error, 2)} || Angle: {round(angle, 2)}")
+    logger.log("Left Distance, Angle: {},{} || Right Distance, Angle: {}, {} || Error: {} || Angle: {}",
+               round(left_distance, 2), left_loc_angle, round(right_distance, 2), right_loc_angle,
+               round(error, 2), round(angle, 2))
 
     # Send speed and angle to the car if trigger is pressed
     if rc.controller.get_trigger(rc.controller.Trigger.RIGHT) > 0: